@@ -1,12 +1,15 @@
 from abc import ABC, abstractmethod
-from typing import List
+from typing import Callable, List, Optional
 from taxonomy_synthesis.models import Item, Category, ClassifiedItem
 
 
 class IClassifier(ABC):
     @abstractmethod
     def classify_items(
-        self, items: List[Item], categories: List[Category]
+        self,
+        items: List[Item],
+        categories: List[Category],
+        on_item: Optional[Callable[[ClassifiedItem], None]] = None,
     ) -> List[ClassifiedItem]:
-        """Classify items into categories."""
+        """Classify items into categories, calling `on_item` for each item as soon as it is classified."""  # noqa: E501
         pass
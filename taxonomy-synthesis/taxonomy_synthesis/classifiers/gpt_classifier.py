@@ -1,5 +1,16 @@
 import json
-from typing import List
+import time
+from collections import Counter
+from typing import (
+    TYPE_CHECKING,
+    Any,
+    Callable,
+    Dict,
+    Iterator,
+    List,
+    Optional,
+    Tuple,
+)
 from taxonomy_synthesis.models import (
     Item,
     Category,
@@ -7,160 +18,314 @@ from taxonomy_synthesis.models import (
     ResponseItem,
 )
 from taxonomy_synthesis.classifiers.classifier_interface import IClassifier
-from openai import OpenAI
+from taxonomy_synthesis.classifiers.stream_parser import ArrayObjectStreamParser
+from taxonomy_synthesis.routing.model_cascade import ModelCascade
+
+if TYPE_CHECKING:
+    from openai import OpenAI
+
+
+def classifier_tool(item_ids: List[str], category_names: List[str]) -> dict:
+    return {
+        "type": "function",
+        "function": {
+            "name": "classifier",
+            "strict": True,
+            "parameters": {
+                "$defs": {
+                    "classified_item": {
+                        "description": "Matches the item with its category.",
+                        "properties": {
+                            "item_id": {
+                                "description": "The id of the item",
+                                "enum": item_ids,
+                                "title": "Item Id",
+                                "type": "string",
+                            },
+                            "category_name": {
+                                "description": "The name of the category",
+                                "enum": category_names,
+                                "title": "Category Name",
+                                "type": "string",
+                            },
+                        },
+                        "required": ["item_id", "category_name"],
+                        "title": "ClassifiedItemModel",
+                        "type": "object",
+                        "additionalProperties": False,
+                    }
+                },
+                "description": "List of classified items.",
+                "properties": {
+                    "classified_items": {
+                        "description": "List of classified items",
+                        "items": {"$ref": "#/$defs/classified_item"},
+                        "title": "Classified Items",
+                        "type": "array",
+                    }
+                },
+                "required": ["classified_items"],
+                "title": "ClassifierModel",
+                "type": "object",
+                "additionalProperties": False,
+            },
+            "description": "List of classified items.",
+        },
+    }
 
 
 class GPTClassifier(IClassifier):
-    def __init__(self, client: OpenAI):
+    def __init__(
+        self,
+        client: "OpenAI",
+        cascade: Optional[ModelCascade] = None,
+        max_retries: int = 3,
+        stream: bool = False,
+    ):
+        """
+        With `stream=True` each item is emitted as soon as its JSON object is complete. The first label of an
+        item wins and later inconsistent duplicates are ignored, so only missing items are escalated; agreement
+        based escalation is not possible and tiers with `samples > 1` are rejected.
+        """  # noqa: E501
         self.client = client
+        self.cascade = cascade or ModelCascade()
+        self.max_retries = max_retries
+        self.stream = stream
+        if stream and any(tier.samples > 1 for tier in self.cascade.tiers):
+            raise ValueError(
+                "Streaming classification does not support tiers with samples > 1."
+            )
 
-    def classify_items(
-        self, items: List[Item], categories: List[Category]
-    ) -> List[ClassifiedItem]:
+    def _batch_items(self, items: List[Item]) -> List[List[Item]]:
         # if stringified items.model_dump() divided by 3 is longer than 60000 characters
         # then divide the items into the upper bound of divinding the stringified items.model_dump() by 60000 characters
         item_token_count = len(str([item.model_dump() for item in items])) / 3
         divisions = ((item_token_count + 30000) // 60000) + 1
-        batches = [items]
-        if divisions > 1:
-            batches = [
-                items[i : i + int(len(items) // divisions)]
-                for i in range(0, len(items), int(len(items) // divisions))
-            ]
+        if divisions <= 1:
+            return [items]
+        batch_size = max(1, int(len(items) // divisions))
+        return [items[i : i + batch_size] for i in range(0, len(items), batch_size)]
 
+    def classify_items(
+        self,
+        items: List[Item],
+        categories: List[Category],
+        on_item: Optional[Callable[[ClassifiedItem], None]] = None,
+    ) -> List[ClassifiedItem]:
         classified_items = []
-        for batch in batches:
-            prompt = f"""I will provide you with items and categories. You need to classify the items into the correct category.
+        for batch in self._batch_items(items):
+            classified_items += self._classify_batch(batch, categories, 0, 0, on_item)
+        return classified_items
+
+    def _prompt(self, batch: List[Item], categories: List[Category]) -> str:
+        return f"""I will provide you with items and categories. You need to classify the items into the correct category.
     ITEMS:
     ```
-    {[item.model_dump() for item in items]}
+    {[item.model_dump() for item in batch]}
     ```
     CATEGORIES:
     ```
     {[category.model_dump() for category in categories]}
     ```"""  # noqa: E501
-            item_ids = [item.id for item in batch]
-            category_names = [category.name for category in categories]
-            response = self.client.beta.chat.completions.parse(
-                model="gpt-4o-mini",
-                messages=[{"role": "user", "content": prompt}],
-                tools=[
-                    {
-                        "type": "function",
-                        "function": {
-                            "name": "classifier",
-                            "strict": True,
-                            "parameters": {
-                                "$defs": {
-                                    "classified_item": {
-                                        "description": "Matches the item with its category.",
-                                        "properties": {
-                                            "item_id": {
-                                                "description": "The id of the item",
-                                                "enum": item_ids,
-                                                "title": "Item Id",
-                                                "type": "string",
-                                            },
-                                            "category_name": {
-                                                "description": "The name of the category",
-                                                "enum": category_names,
-                                                "title": "Category Name",
-                                                "type": "string",
-                                            },
-                                        },
-                                        "required": ["item_id", "category_name"],
-                                        "title": "ClassifiedItemModel",
-                                        "type": "object",
-                                        "additionalProperties": False,
-                                    }
-                                },
-                                "description": "List of classified items.",
-                                "properties": {
-                                    "classified_items": {
-                                        "description": "List of classified items",
-                                        "items": {"$ref": "#/$defs/classified_item"},
-                                        "title": "Classified Items",
-                                        "type": "array",
-                                    }
-                                },
-                                "required": ["classified_items"],
-                                "title": "ClassifierModel",
-                                "type": "object",
-                                "additionalProperties": False,
-                            },
-                            "description": "List of classified items.",
-                        },
-                    }
-                ],
+
+    def _request_votes(
+        self, batch: List[Item], categories: List[Category], tier_index: int
+    ) -> Dict[str, List[str]]:
+        """
+        Ask the model of the given tier to classify the batch and collect every category it voted for, per item id.
+        """  # noqa: E501
+        tier = self.cascade.tiers[tier_index]
+        item_ids = [item.id for item in batch]
+        category_names = [category.name for category in categories]
+        start = time.perf_counter()
+        response = self.client.beta.chat.completions.parse(
+            model=tier.model,
+            messages=[{"role": "user", "content": self._prompt(batch, categories)}],
+            tools=[classifier_tool(item_ids, category_names)],  # type: ignore
+            n=tier.samples,
+        )
+        self.cascade.record(
+            tier_index, response, time.perf_counter() - start, len(batch)
+        )
+
+        # Check if response has the expected structure
+        if not response.choices or not any(
+            choice.message.tool_calls for choice in response.choices
+        ):
+            raise ValueError("Model response is missing the expected structure.")
+
+        votes: Dict[str, List[str]] = {}
+        for choice in response.choices:
+            if not choice.message.tool_calls:
+                continue
+            arguments = choice.message.tool_calls[0].function.arguments
+            response_items = json.loads(arguments)["classified_items"]
+            for response_item in response_items:
+                response_item = ResponseItem(**response_item)
+                votes.setdefault(response_item.item_id, []).append(
+                    response_item.category_name
+                )
+        return votes
+
+    def _resolve_votes(
+        self,
+        batch: List[Item],
+        categories: List[Category],
+        tier_index: int,
+        on_item: Optional[Callable[[ClassifiedItem], None]],
+    ) -> Tuple[List[ClassifiedItem], List[Item], List[Item]]:
+        """
+        Request votes for the batch and split it into classified, missing and hard (inconsistent or low agreement) items.
+        When the response is malformed and a next tier exists, the whole batch is returned as missing.
+        """  # noqa: E501
+        tier = self.cascade.tiers[tier_index]
+        has_next = self.cascade.has_next(tier_index)
+        try:
+            votes = self._request_votes(batch, categories, tier_index)
+        except (ValueError, KeyError, TypeError):
+            # a malformed response escalates the whole batch, like in TaxonomyGenerator
+            if not has_next:
+                raise
+            return [], list(batch), []
+        categories_by_name = {category.name: category for category in categories}
+
+        classified_items = []
+        missing_items = []
+        hard_items = []
+        for item in batch:
+            item_votes = votes.get(item.id)
+            if not item_votes:
+                missing_items.append(item)
+                continue
+            category_name, count = Counter(item_votes).most_common(1)[0]
+            agreement = count / max(len(item_votes), tier.samples)
+            if has_next and agreement < self.cascade.min_agreement:
+                hard_items.append(item)
+                continue
+            classified_item = ClassifiedItem(
+                item=item, category=categories_by_name[category_name]
             )
+            classified_items.append(classified_item)
+            if on_item:
+                on_item(classified_item)
+        return classified_items, missing_items, hard_items
 
-            # Check if response has the expected structure
+    def _stream_batch(
+        self,
+        batch: List[Item],
+        categories: List[Category],
+        tier_index: int,
+        on_item: Optional[Callable[[ClassifiedItem], None]],
+    ) -> Tuple[List[ClassifiedItem], List[Item]]:
+        """
+        Stream the classification of the batch, emitting every item as soon as its JSON object is complete.
+        Items are placed on their first occurrence, later duplicates are ignored, so only missing items are returned for escalation.
+        A malformed stream leaves the items not parsed yet as missing when a next tier exists.
+        """  # noqa: E501
+        tier = self.cascade.tiers[tier_index]
+        items_by_id = {item.id: item for item in batch}
+        categories_by_name = {category.name: category for category in categories}
+        start = time.perf_counter()
+        stream = self.client.chat.completions.create(
+            model=tier.model,
+            messages=[{"role": "user", "content": self._prompt(batch, categories)}],
+            tools=[classifier_tool(list(items_by_id), list(categories_by_name))],  # type: ignore
+            tool_choice={"type": "function", "function": {"name": "classifier"}},
+            stream=True,
+            stream_options={"include_usage": True},
+        )
+
+        chunks: List[Any] = []
+        classified_items: Dict[str, ClassifiedItem] = {}
+        for response_item in self._parse_stream(stream, chunks, tier_index):
             if (
-                not response.choices
-                or not response.choices[0]
-                or not response.choices[0].message.tool_calls
+                response_item.item_id in classified_items
+                or response_item.item_id not in items_by_id
+                or response_item.category_name not in categories_by_name
             ):
-                raise ValueError("Model response is missing the expected structure.")
+                continue
+            classified_item = ClassifiedItem(
+                item=items_by_id[response_item.item_id],
+                category=categories_by_name[response_item.category_name],
+            )
+            classified_items[response_item.item_id] = classified_item
+            if on_item:
+                on_item(classified_item)
+        last_chunk = chunks[-1] if chunks else None
+        self.cascade.record(
+            tier_index, last_chunk, time.perf_counter() - start, len(batch)
+        )
 
-            print("1")
-            response_items = (
-                response.choices[0].message.tool_calls[0].function.arguments
+        missing_items = [item for item in batch if item.id not in classified_items]
+        return list(classified_items.values()), missing_items
+
+    def _parse_stream(
+        self, stream: Any, chunks: List[Any], tier_index: int
+    ) -> Iterator[ResponseItem]:
+        """
+        Yield the classified items of the streamed tool call arguments, keeping the last chunk (with the usage) in `chunks`.
+        After a malformed item the stream is still drained, without parsing, so that its usage is recorded.
+        """  # noqa: E501
+        parser = ArrayObjectStreamParser()
+        error: Optional[Exception] = None
+        try:
+            for chunk in stream:
+                chunks[:] = [chunk]
+                if error or not chunk.choices or not chunk.choices[0].delta.tool_calls:
+                    continue
+                for tool_call in chunk.choices[0].delta.tool_calls:
+                    if not tool_call.function or not tool_call.function.arguments:
+                        continue
+                    try:
+                        parsed_items = parser.feed(tool_call.function.arguments)
+                        response_items = [
+                            ResponseItem(**parsed_item) for parsed_item in parsed_items
+                        ]
+                    except (ValueError, KeyError, TypeError) as e:
+                        error = e
+                        break
+                    yield from response_items
+        finally:
+            if hasattr(stream, "close"):
+                stream.close()
+        if error and not self.cascade.has_next(tier_index):
+            raise error
+
+    def _classify_batch(
+        self,
+        batch: List[Item],
+        categories: List[Category],
+        tier_index: int,
+        retry: int,
+        on_item: Optional[Callable[[ClassifiedItem], None]] = None,
+    ) -> List[ClassifiedItem]:
+        """
+        Classify the batch on the given tier, escalating missing, inconsistent or low agreement items to the next tier.
+        """  # noqa: E501
+        if self.stream:
+            classified_items, missing_items = self._stream_batch(
+                batch, categories, tier_index, on_item
+            )
+            hard_items: List[Item] = []
+        else:
+            classified_items, missing_items, hard_items = self._resolve_votes(
+                batch, categories, tier_index, on_item
             )
-            response_items = json.loads(response_items)
-            response_items = response_items["classified_items"]
-            print("2")
-
-            # filter out redundant items
-            unique_items = set()
-            for item in response_items:
-                unique_items.add(item["item_id"])
-
-            print("2.5")
-            response_items = [
-                response_item
-                for response_item in response_items
-                if response_item["item_id"] in unique_items
-            ]
-            print("3")
-
-            # missing items
-            missing_items = set(item_ids) - unique_items
-            if missing_items:
-                missing_items_list = [
-                    item for item in items if item.id in missing_items
-                ]
-                # recurse untill all items are classified
-                classified_items = self.classify_items(missing_items_list, categories)
-                response_items += [
-                    {
-                        "item_id": classified_item.item.id,
-                        "category_name": classified_item.category.name,
-                    }
-                    for classified_item in classified_items
-                ]
-                response_items += self.classify_items(missing_items_list, categories)
-
-            print("4")
-            response_items = [
-                ResponseItem(**response_item) for response_item in response_items
-            ]
-
-            print("5")
-            # Map response items to ClassifiedItem objects
-            response_items = [
-                ClassifiedItem(
-                    item=next(
-                        item for item in items if item.id == response_item.item_id
-                    ),
-                    category=next(
-                        category
-                        for category in categories
-                        if category.name == response_item.category_name
-                    ),
-                )
-                for response_item in response_items
-            ]
 
-            classified_items += response_items
+        if self.cascade.has_next(tier_index) and (missing_items or hard_items):
+            escalated_items = missing_items + hard_items
+            self.cascade.record_escalation(tier_index, len(escalated_items))
+            classified_items += self._classify_batch(
+                escalated_items, categories, tier_index + 1, 0, on_item
+            )
+        elif missing_items:
+            # retry on the strongest tier until all items are classified
+            if retry >= self.max_retries:
+                raise ValueError(
+                    f"Items {[item.id for item in missing_items]} could not be classified."
+                )
+            classified_items += self._classify_batch(
+                missing_items, categories, tier_index, retry + 1, on_item
+            )
 
         return classified_items
@@ -0,0 +1,51 @@
+import json
+from typing import List
+
+
+class ArrayObjectStreamParser:
+    """
+    Incrementally parses streamed JSON of the form `{"key": [{...}, {...}]}`,
+    returning every object of the array as soon as its closing brace arrives.
+    """  # noqa: E501
+
+    def __init__(self):
+        self.buffer = ""
+        self.position = 0
+        self.depth = 0
+        self.in_string = False
+        self.escaped = False
+        self.object_start = -1
+
+    def feed(self, text: str) -> List[dict]:
+        """
+        Consume the next chunk of text and return the objects it completed.
+        """
+        self.buffer += text
+        objects = []
+        while self.position < len(self.buffer):
+            char = self.buffer[self.position]
+            if self.in_string:
+                if self.escaped:
+                    self.escaped = False
+                elif char == "\\":
+                    self.escaped = True
+                elif char == '"':
+                    self.in_string = False
+            elif char == '"':
+                self.in_string = True
+            elif char in "{[":
+                self.depth += 1
+                if char == "{" and self.depth == 3:
+                    self.object_start = self.position
+            elif char in "}]":
+                if char == "}" and self.depth == 3:
+                    objects.append(
+                        json.loads(self.buffer[self.object_start : self.position + 1])
+                    )
+                    # drop the parsed object to keep the buffer small
+                    self.buffer = self.buffer[self.position + 1 :]
+                    self.position = -1
+                    self.object_start = -1
+                self.depth -= 1
+            self.position += 1
+        return objects
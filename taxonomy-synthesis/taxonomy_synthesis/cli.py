@@ -0,0 +1,340 @@
+import argparse
+import importlib
+import json
+import sys
+import time
+from typing import Any, Dict, Iterator, List, Optional, TextIO
+from taxonomy_synthesis.models import (
+    Item,
+    Category,
+    ClassifiedItem,
+    ModelTier,
+)
+from taxonomy_synthesis.classifiers.gpt_classifier import GPTClassifier
+from taxonomy_synthesis.dedup.item_deduplicator import ItemDeduplicator
+from taxonomy_synthesis.generator.taxonomy_generator import TaxonomyGenerator
+from taxonomy_synthesis.routing.model_cascade import ModelCascade
+from taxonomy_synthesis.tree.tree_node import TreeNode
+from taxonomy_synthesis.tree.node_operator import NodeOperator
+
+# import time of the heavy modules, which are only imported by the subcommands that need them
+IMPORT_TIMES: Dict[str, float] = {}
+
+
+def _lazy_import(name: str) -> Any:
+    if name in sys.modules:
+        return sys.modules[name]
+    start = time.perf_counter()
+    module = importlib.import_module(name)
+    IMPORT_TIMES[name] = time.perf_counter() - start
+    return module
+
+
+class GPTClassifierFactory:
+    """
+    Picklable factory of GPTClassifier, so that shard workers can build their own client.
+    """  # noqa: E501
+
+    def __init__(self, models: List[str], stream: bool = False):
+        self.models = models
+        self.stream = stream
+
+    def __call__(self) -> GPTClassifier:
+        return GPTClassifier(
+            client=_client(), cascade=_cascade(self.models), stream=self.stream
+        )
+
+
+def _client():
+    return _lazy_import("openai").OpenAI()
+
+
+def _cascade(models: List[str]) -> ModelCascade:
+    return ModelCascade(tiers=[ModelTier(model=model) for model in models])
+
+
+def _read_items(path: Optional[str]) -> Iterator[Item]:
+    lines: TextIO = open(path) if path else sys.stdin
+    try:
+        for line in lines:
+            if line.strip():
+                yield Item(**json.loads(line))
+    finally:
+        if path:
+            lines.close()
+
+
+def _write_line(data: Dict[str, Any]) -> None:
+    sys.stdout.write(json.dumps(data, ensure_ascii=False) + "\n")
+    sys.stdout.flush()
+
+
+def _load_tree(path: str) -> TreeNode:
+    with open(path) as file:
+        return TreeNode.from_dict(json.load(file))
+
+
+def _save_tree(tree: TreeNode, path: Optional[str]) -> None:
+    if path is None:
+        _write_line(tree.to_dict())
+        return
+    with open(path, "w") as file:
+        json.dump(tree.to_dict(), file, ensure_ascii=False)
+
+
+def _find_node(tree: TreeNode, path: Optional[str]) -> TreeNode:
+    node = tree.find(path) if path else tree
+    if node is None:
+        raise ValueError(f"Node '{path}' not found in the tree")
+    return node
+
+
+def _operator(args: argparse.Namespace, generator: Any = None) -> NodeOperator:
+    factory = GPTClassifierFactory(args.model, args.stream)
+    if args.shards:
+        sharded_classifier = _lazy_import(
+            "taxonomy_synthesis.sharding.sharded_classifier"
+        )
+        classifier = sharded_classifier.ShardedClassifier(
+            factory, args.shards, args.processes, args.queue, timeout=args.timeout
+        )
+    else:
+        classifier = factory()
+    deduplicator = None
+    if args.dedup or args.near_duplicates:
+        deduplicator = ItemDeduplicator(near_duplicates=args.near_duplicates)
+    return NodeOperator(
+        classifier=classifier, generator=generator, deduplicator=deduplicator
+    )
+
+
+def build(args: argparse.Namespace) -> None:
+    """
+    Build a taxonomy tree from the items, generating `depth` levels of subcategories.
+    """
+    tree = TreeNode(value=Category(name=args.name, description=args.description))
+    tree.add_items(list(_read_items(args.input)))
+
+    generator_class = TaxonomyGenerator
+    if args.cluster:
+        generator_class = _lazy_import(
+            "taxonomy_synthesis.generator.cluster_taxonomy_generator"
+        ).ClusterTaxonomyGenerator
+    generator = generator_class(
+        client=_client(),
+        generation_method=args.generation_method,
+        max_categories=args.max_categories,
+        cascade=_cascade(args.model),
+    )
+    operator = _operator(args, generator)
+
+    level = [tree]
+    for _ in range(args.depth):
+        next_level = []
+        for node in level:
+            if not node.items:
+                continue
+            if args.cluster:
+                operator.generate_classified_subcategories(node)
+            else:
+                operator.generate_subcategories(node)
+                operator.classify_items(node, list(node.items))
+            next_level += node.children
+        level = next_level
+
+    _save_tree(tree, args.tree)
+
+
+def classify(args: argparse.Namespace) -> None:
+    """
+    Classify the items into the subcategories of a node, writing each classified item as soon as it is placed.
+    """  # noqa: E501
+    tree = _load_tree(args.tree)
+    node = _find_node(tree, args.node)
+
+    def on_item(classified_item: ClassifiedItem) -> None:
+        _write_line(
+            {
+                "item_id": classified_item.item.id,
+                "category": classified_item.category.name,
+            }
+        )
+
+    _operator(args).classify_items(node, list(_read_items(args.input)), on_item)
+    _save_tree(tree, args.output or args.tree)
+
+
+def update(args: argparse.Namespace) -> None:
+    """
+    Place the items in the tree, classifying them level by level down to the leaves.
+    """
+    tree = _load_tree(args.tree)
+    operator = _operator(args)
+
+    def place(node: TreeNode, items: List[Item]) -> None:
+        if not node.children:
+            path = node.path()
+            for item in items:
+                _write_line({"item_id": item.id, "path": path})
+            return
+        classified_items = operator.classify_items(node, items)
+        for child in node.children:
+            child_items = [
+                classified_item.item
+                for classified_item in classified_items
+                if classified_item.category.name == child.value.name
+            ]
+            if child_items:
+                place(child, child_items)
+
+    node = _find_node(tree, args.node)
+    items = list(_read_items(args.input))
+    if not node.children:
+        # a leaf target is not classified, so replace the items here
+        item_ids = {item.id for item in items}
+        node.items = [item for item in node.items if item.id not in item_ids]
+        node.add_items(items)
+    place(node, items)
+    _save_tree(tree, args.output or args.tree)
+
+
+def export(args: argparse.Namespace) -> None:
+    """
+    Write every item of the tree with the path of its node, or the printed tree.
+    """
+    tree = _find_node(_load_tree(args.tree), args.node)
+    if args.format == "text":
+        sys.stdout.write(tree.print_tree())
+        return
+
+    def walk(node: TreeNode) -> None:
+        path = node.path()
+        for item in node.items:
+            _write_line({"path": path, "item": item.model_dump()})
+        for child in node.children:
+            walk(child)
+
+    walk(tree)
+
+
+def worker(args: argparse.Namespace) -> None:
+    """
+    Classify shards from a shared queue file until it is drained.
+    """
+    sharded_classifier = _lazy_import("taxonomy_synthesis.sharding.sharded_classifier")
+    processed = sharded_classifier.run_worker(
+        args.queue,
+        GPTClassifierFactory(args.model, args.stream),
+        idle_timeout=args.idle_timeout,
+    )
+    _write_line({"processed_shards": processed})
+
+
+def _add_llm_arguments(parser: argparse.ArgumentParser) -> None:
+    parser.add_argument(
+        "--model",
+        action="append",
+        help="Model tier, cheapest first; repeat to add tiers (default: gpt-4o-mini).",
+    )
+    parser.add_argument(
+        "--stream", action="store_true", help="Stream classification results."
+    )
+
+
+def _add_classification_arguments(parser: argparse.ArgumentParser) -> None:
+    _add_llm_arguments(parser)
+    parser.add_argument("--input", help="Items JSONL file (default: stdin).")
+    parser.add_argument(
+        "--dedup", action="store_true", help="Classify exact duplicates once."
+    )
+    parser.add_argument(
+        "--near-duplicates",
+        action="store_true",
+        help="Also classify near-duplicates once.",
+    )
+    parser.add_argument(
+        "--shards", type=int, default=0, help="Classify in this many shards."
+    )
+    parser.add_argument("--processes", type=int, help="Local shard worker processes.")
+    parser.add_argument("--queue", help="Shard queue file shared with other hosts.")
+    parser.add_argument(
+        "--timeout",
+        type=float,
+        help="Seconds to wait for the shards (default: 3600 with --queue, else none).",
+    )
+
+
+def _parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(prog="taxonomy-synthesis")
+    parser.add_argument(
+        "--timings",
+        action="store_true",
+        help="Report startup CPU time and import times to stderr.",
+    )
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    build_parser = subparsers.add_parser("build", help=build.__doc__)
+    _add_classification_arguments(build_parser)
+    build_parser.add_argument("--tree", help="Output tree file (default: stdout).")
+    build_parser.add_argument("--name", default="root", help="Root category name.")
+    build_parser.add_argument("--description", default="", help="Root description.")
+    build_parser.add_argument("--depth", type=int, default=1)
+    build_parser.add_argument("--max-categories", type=int)
+    build_parser.add_argument("--generation-method", default="")
+    build_parser.add_argument(
+        "--cluster", action="store_true", help="Cluster items before naming them."
+    )
+    build_parser.set_defaults(func=build)
+
+    for command in (classify, update):
+        command_parser = subparsers.add_parser(command.__name__, help=command.__doc__)
+        _add_classification_arguments(command_parser)
+        command_parser.add_argument("--tree", required=True, help="Tree file.")
+        command_parser.add_argument("--node", help="Node path (default: root).")
+        command_parser.add_argument(
+            "--output", help="Output tree file (default: --tree)."
+        )
+        command_parser.set_defaults(func=command)
+
+    export_parser = subparsers.add_parser("export", help=export.__doc__)
+    export_parser.add_argument("--tree", required=True, help="Tree file.")
+    export_parser.add_argument("--node", help="Node path (default: root).")
+    export_parser.add_argument("--format", choices=["jsonl", "text"], default="jsonl")
+    export_parser.set_defaults(func=export)
+
+    worker_parser = subparsers.add_parser("worker", help=worker.__doc__)
+    _add_llm_arguments(worker_parser)
+    worker_parser.add_argument("--queue", required=True, help="Shard queue file.")
+    worker_parser.add_argument(
+        "--idle-timeout",
+        type=float,
+        default=0.0,
+        help="Seconds to keep waiting for new shards once the queue is empty.",
+    )
+    worker_parser.set_defaults(func=worker)
+    return parser
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    args = _parser().parse_args(argv)
+    if hasattr(args, "model"):
+        args.model = args.model or ["gpt-4o-mini"]
+    # CPU time of the process so far, including the interpreter start and every import
+    startup_cpu = time.process_time()
+    start = time.perf_counter()
+    args.func(args)
+    if args.timings:
+        sys.stderr.write(
+            json.dumps(
+                {
+                    "startup_cpu_seconds": startup_cpu,
+                    "import_seconds": IMPORT_TIMES,
+                    "command_seconds": time.perf_counter() - start,
+                }
+            )
+            + "\n"
+        )
+
+
+if __name__ == "__main__":
+    main()
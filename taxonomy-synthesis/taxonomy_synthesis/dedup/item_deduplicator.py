@@ -0,0 +1,169 @@
+import hashlib
+import json
+import re
+import zlib
+from typing import Any, Dict, List, Optional, Set
+from taxonomy_synthesis.models import Item
+
+_MERSENNE_PRIME = (1 << 61) - 1
+_MAX_HASH = (1 << 32) - 1
+
+
+def _normalize(value: Any) -> Any:
+    if isinstance(value, str):
+        return re.sub(r"\s+", " ", value).strip().lower()
+    if isinstance(value, dict):
+        return {key: _normalize(val) for key, val in value.items()}
+    if isinstance(value, (list, tuple)):
+        return [_normalize(val) for val in value]
+    return value
+
+
+def _hash(data: bytes) -> int:
+    return int.from_bytes(hashlib.blake2b(data, digest_size=8).digest(), "big")
+
+
+class ItemDeduplicator:
+    """
+    Group items whose content (every field except `id`) is identical after normalization,
+    and optionally items that are near-duplicates according to MinHash/LSH over their text fields.
+
+    The first item of each group is its representative.
+    """  # noqa: E501
+
+    def __init__(
+        self,
+        near_duplicates: bool = False,
+        threshold: float = 0.8,
+        num_perm: int = 64,
+        bands: int = 16,
+        shingle_size: int = 5,
+    ):
+        if num_perm % bands:
+            raise ValueError("num_perm must be divisible by bands")
+        self.near_duplicates = near_duplicates
+        self.threshold = threshold
+        self.num_perm = num_perm
+        self.bands = bands
+        self.shingle_size = shingle_size
+        # 31-bit coefficients on 32-bit shingle hashes keep a * shingle + b below 2 ** 63,
+        # so the NumPy uint64 signatures match the pure Python ones exactly
+        self._permutations = [
+            (
+                _hash(f"a{i}".encode()) % (1 << 31) + 1,
+                _hash(f"b{i}".encode()) % (1 << 31),
+            )
+            for i in range(num_perm)
+        ]
+        self._np: Optional[Any] = None
+        if near_duplicates:
+            try:
+                import numpy
+
+                self._np = numpy
+                self._coefficients = numpy.array(self._permutations, dtype=numpy.uint64)
+            except ImportError:  # pragma: no cover
+                # pure Python MinHash is much slower (about 8 ms per 300 characters item),
+                # install numpy with `pip install taxonomy-synthesis[clustering]`
+                self._np = None
+
+    def content_hash(self, item: Item) -> str:
+        """
+        Hash of the normalized content of the item, ignoring its id.
+        """
+        content = {
+            key: value for key, value in item.model_dump().items() if key != "id"
+        }
+        serialized = json.dumps(_normalize(content), sort_keys=True, default=str)
+        return hashlib.sha1(serialized.encode()).hexdigest()
+
+    def group(self, items: List[Item]) -> List[List[Item]]:
+        """
+        Group the items into duplicates, preserving the order of first appearance.
+        Item ids must be unique, since the groups are mapped back to their members by id.
+        """
+        item_ids: Set[str] = set()
+        for item in items:
+            if item.id in item_ids:
+                raise ValueError(f"Item id '{item.id}' is repeated in the items")
+            item_ids.add(item.id)
+
+        groups: Dict[str, List[Item]] = {}
+        for item in items:
+            groups.setdefault(self.content_hash(item), []).append(item)
+        exact_groups = list(groups.values())
+        if not self.near_duplicates:
+            return exact_groups
+        return self._merge_near_duplicates(exact_groups)
+
+    def _text(self, item: Item) -> str:
+        texts = [
+            value
+            for key, value in item.model_dump().items()
+            if key != "id" and isinstance(value, str)
+        ]
+        return _normalize(" ".join(texts))
+
+    def _shingles(self, text: str) -> Set[int]:
+        if len(text) <= self.shingle_size:
+            return {zlib.crc32(text.encode())}
+        return {
+            zlib.crc32(text[i : i + self.shingle_size].encode())
+            for i in range(len(text) - self.shingle_size + 1)
+        }
+
+    def _signature(self, shingles: Set[int]) -> List[int]:
+        if self._np is not None:
+            np = self._np
+            values = np.fromiter(shingles, dtype=np.uint64, count=len(shingles))
+            hashes = (
+                self._coefficients[:, :1] * values[None, :] + self._coefficients[:, 1:]
+            ) % np.uint64(_MERSENNE_PRIME) & np.uint64(_MAX_HASH)
+            return hashes.min(axis=1).tolist()
+        return [
+            min(
+                ((a * shingle + b) % _MERSENNE_PRIME) & _MAX_HASH
+                for shingle in shingles
+            )
+            for a, b in self._permutations
+        ]
+
+    def _merge_near_duplicates(self, groups: List[List[Item]]) -> List[List[Item]]:
+        signatures = []
+        for group in groups:
+            text = self._text(group[0])
+            signatures.append(self._signature(self._shingles(text)) if text else None)
+
+        # union-find over the exact groups
+        parents = list(range(len(groups)))
+
+        def find(index: int) -> int:
+            while parents[index] != index:
+                parents[index] = parents[parents[index]]
+                index = parents[index]
+            return index
+
+        rows = self.num_perm // self.bands
+        for band in range(self.bands):
+            buckets: Dict[tuple, int] = {}
+            for index, signature in enumerate(signatures):
+                if signature is None:
+                    continue
+                key = tuple(signature[band * rows : (band + 1) * rows])
+                if key not in buckets:
+                    buckets[key] = index
+                    continue
+                other = buckets[key]
+                root, other_root = find(index), find(other)
+                if root == other_root:
+                    continue
+                similarity = sum(
+                    a == b for a, b in zip(signature, signatures[other])  # type: ignore
+                ) / float(self.num_perm)
+                if similarity >= self.threshold:
+                    parents[max(root, other_root)] = min(root, other_root)
+
+        merged: Dict[int, List[Item]] = {}
+        for index, group in enumerate(groups):
+            merged.setdefault(find(index), []).extend(group)
+        return [merged[root] for root in sorted(merged)]
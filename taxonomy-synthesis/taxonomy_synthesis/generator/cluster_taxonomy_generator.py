@@ -0,0 +1,268 @@
+import hashlib
+import math
+import re
+from collections import Counter
+from typing import TYPE_CHECKING, Callable, Dict, List, Optional, Tuple
+from taxonomy_synthesis.models import Item, Category, ClassifiedItem
+from taxonomy_synthesis.generator.generator_interface import IClassifiedGenerator
+from taxonomy_synthesis.generator.taxonomy_generator import TaxonomyGenerator
+from taxonomy_synthesis.routing.model_cascade import ModelCascade
+
+if TYPE_CHECKING:
+    from openai import OpenAI
+
+try:
+    import numpy as np
+except ImportError as e:  # pragma: no cover
+    raise ImportError(
+        "ClusterTaxonomyGenerator requires numpy, install it with "
+        "`pip install taxonomy-synthesis[clustering]`."
+    ) from e
+
+
+def _tokens(item: Item) -> List[str]:
+    tokens = []
+    for key, value in item.model_dump().items():
+        if key == "id":
+            continue
+        if isinstance(value, str):
+            tokens += re.findall(r"\w+", value.lower())
+        else:
+            tokens.append(f"{key}={value}")
+    return tokens
+
+
+def hashing_embedder(items: List[Item], dimensions: int = 512) -> "np.ndarray":
+    """
+    Embed items locally as TF-IDF weighted hashed bags of words over every field except `id`.
+    """  # noqa: E501
+    embeddings = np.zeros((len(items), dimensions))
+    for row, item in enumerate(items):
+        for token, count in Counter(_tokens(item)).items():
+            digest = hashlib.blake2b(token.encode(), digest_size=8).digest()
+            embeddings[row, int.from_bytes(digest, "big") % dimensions] += 1 + math.log(
+                count
+            )
+    document_frequency = (embeddings > 0).sum(axis=0)
+    embeddings *= np.log((1 + len(items)) / (1 + document_frequency)) + 1
+    norms = np.linalg.norm(embeddings, axis=1, keepdims=True)
+    return embeddings / np.where(norms == 0, 1, norms)
+
+
+def _squared_distances(
+    embeddings: "np.ndarray", centroids: "np.ndarray"
+) -> "np.ndarray":
+    return (
+        (embeddings**2).sum(axis=1)[:, None]
+        - 2 * embeddings @ centroids.T
+        + (centroids**2).sum(axis=1)[None]
+    ).clip(min=0)
+
+
+def kmeans(
+    embeddings: "np.ndarray", k: int, seed: int = 0, max_iterations: int = 50
+) -> "np.ndarray":
+    """
+    Cluster the embeddings with k-means++ and return the cluster label of each row.
+    """  # noqa: E501
+    random = np.random.RandomState(seed)
+    centroids = embeddings[[random.randint(len(embeddings))]]
+    for _ in range(1, k):
+        distances = _squared_distances(embeddings, centroids).min(axis=1)
+        if distances.sum() == 0:
+            break
+        row = random.choice(len(embeddings), p=distances / distances.sum())
+        centroids = np.vstack([centroids, embeddings[row]])
+
+    labels = np.zeros(len(embeddings), dtype=int)
+    for iteration in range(max_iterations):
+        new_labels = _squared_distances(embeddings, centroids).argmin(axis=1)
+        if iteration and np.array_equal(new_labels, labels):
+            break
+        labels = new_labels
+        for cluster in range(len(centroids)):
+            members = embeddings[labels == cluster]
+            if len(members):
+                centroids[cluster] = members.mean(axis=0)
+
+    # number the non-empty clusters in order of first appearance
+    _, first_rows, inverse = np.unique(labels, return_index=True, return_inverse=True)
+    return np.argsort(np.argsort(first_rows))[inverse.reshape(-1)]
+
+
+def cluster_categories_tool(cluster_ids: List[str]) -> dict:
+    return {
+        "type": "function",
+        "function": {
+            "name": "cluster_categories",
+            "strict": True,
+            "parameters": {
+                "$defs": {
+                    "cluster_category": {
+                        "description": "Category describing a cluster of items.",
+                        "properties": {
+                            "cluster_id": {
+                                "description": "The id of the cluster",
+                                "enum": cluster_ids,
+                                "type": "string",
+                            },
+                            "name": {
+                                "description": "Name of the category.",
+                                "type": "string",
+                            },
+                            "description": {
+                                "description": "Description and instruction for how to use this category.",
+                                "type": "string",
+                            },
+                        },
+                        "required": ["cluster_id", "name", "description"],
+                        "type": "object",
+                        "additionalProperties": False,
+                    }
+                },
+                "description": "Names and describes every cluster.",
+                "properties": {
+                    "categories": {
+                        "description": "One category per cluster.",
+                        "items": {"$ref": "#/$defs/cluster_category"},
+                        "type": "array",
+                    }
+                },
+                "required": ["categories"],
+                "type": "object",
+                "additionalProperties": False,
+            },
+            "description": "Names and describes every cluster.",
+        },
+    }
+
+
+class ClusterTaxonomyGenerator(TaxonomyGenerator, IClassifiedGenerator):
+    """
+    Generates subcategories by clustering the items locally and asking the model only to name and
+    describe each cluster from a few exemplars and statistics, so the items come back already assigned.
+    """  # noqa: E501
+
+    def __init__(
+        self,
+        client: "OpenAI",
+        generation_method: str = "",
+        max_categories: Optional[int] = None,
+        cascade: Optional[ModelCascade] = None,
+        num_clusters: int = 8,
+        exemplars_per_cluster: int = 5,
+        embedder: Optional[Callable[[List[Item]], "np.ndarray"]] = None,
+        seed: int = 0,
+    ):
+        super().__init__(client, generation_method, max_categories, cascade)
+        self.num_clusters = num_clusters
+        self.exemplars_per_cluster = exemplars_per_cluster
+        self.embedder = embedder or hashing_embedder
+        self.seed = seed
+
+    def generate_categories(
+        self,
+        items: List[Item],
+        parent_category: Category,
+        max_categories: Optional[int] = None,
+        session_key: Optional[str] = None,
+    ) -> List[Category]:
+        categories, _ = self.generate_classified_categories(
+            items, parent_category, max_categories, session_key
+        )
+        return categories
+
+    def generate_classified_categories(
+        self,
+        items: List[Item],
+        parent_category: Category,
+        max_categories: Optional[int] = None,
+        session_key: Optional[str] = None,
+    ) -> Tuple[List[Category], List[ClassifiedItem]]:
+        """
+        Cluster the items, name each cluster as a subcategory and return the subcategories with every item classified into its cluster's subcategory.
+        """  # noqa: E501
+        max_categories = max_categories or self.max_categories
+        if not items:
+            return [], []
+
+        embeddings = np.asarray(self.embedder(items), dtype=float)
+        k = min(max_categories or self.num_clusters, len(items))
+        labels = kmeans(embeddings, k, self.seed)
+        cluster_ids = [str(cluster) for cluster in range(labels.max() + 1)]
+
+        summaries = []
+        centroids = []
+        for cluster, cluster_id in enumerate(cluster_ids):
+            rows = np.where(labels == cluster)[0]
+            centroid = embeddings[rows].mean(axis=0)
+            centroids.append(centroid)
+            closest = rows[np.argsort(-(embeddings[rows] @ centroid))]
+            token_counts = Counter(
+                token for row in rows for token in set(_tokens(items[row]))
+            )
+            summaries.append(
+                {
+                    "cluster_id": cluster_id,
+                    "size": len(rows),
+                    "top_terms": [token for token, _ in token_counts.most_common(10)],
+                    "exemplars": [
+                        items[row].model_dump()
+                        for row in closest[: self.exemplars_per_cluster]
+                    ],
+                }
+            )
+
+        prompt = f"""I clustered {len(items)} items inside the parent category titled `{parent_category.name}` described as `{parent_category.description}`.
+For every cluster I will provide its size, its most frequent terms and a few exemplar items.
+You need to name and describe a subcategory for every cluster according to the following guideline:
+Clusters that belong together may share the same subcategory name.
+The created subcategories should not duplicate the parent category '{parent_category.name}'. {self.generation_method}
+CLUSTERS:
+```
+{summaries}
+```"""  # noqa
+        named_clusters = self._request_tool(
+            [{"role": "user", "content": prompt}],
+            cluster_categories_tool(cluster_ids),
+            lambda arguments: {
+                cluster["cluster_id"]: Category(
+                    name=cluster["name"], description=cluster["description"]
+                )
+                for cluster in arguments["categories"]
+            },
+        )
+        if not named_clusters:
+            raise ValueError("Model response did not name any cluster.")
+
+        # clusters the model skipped join the closest named cluster
+        named_rows = [int(cluster_id) for cluster_id in named_clusters]
+        categories_by_cluster: Dict[int, Category] = {}
+        for cluster, cluster_id in enumerate(cluster_ids):
+            if cluster_id in named_clusters:
+                categories_by_cluster[cluster] = named_clusters[cluster_id]
+                continue
+            similarities = [centroids[cluster] @ centroids[row] for row in named_rows]
+            closest_cluster = named_rows[int(np.argmax(similarities))]
+            categories_by_cluster[cluster] = named_clusters[str(closest_cluster)]
+
+        # clusters named alike share the same category
+        categories: Dict[str, Category] = {}
+        for cluster in range(len(cluster_ids)):
+            category = categories_by_cluster[cluster]
+            categories_by_cluster[cluster] = categories.setdefault(
+                category.name, category
+            )
+
+        new_categories = list(categories.values())
+        self._open_session(
+            session_key or parent_category.name,
+            parent_category,
+            items,
+            new_categories,
+            max_categories,
+        )
+        return new_categories, [
+            ClassifiedItem(item=item, category=categories_by_cluster[int(label)])
+            for item, label in zip(items, labels)
+        ]
@@ -0,0 +1,16 @@
+from abc import ABC, abstractmethod
+from typing import List, Optional, Tuple
+from taxonomy_synthesis.models import Item, Category, ClassifiedItem
+
+
+class IClassifiedGenerator(ABC):
+    @abstractmethod
+    def generate_classified_categories(
+        self,
+        items: List[Item],
+        parent_category: Category,
+        max_categories: Optional[int] = None,
+        session_key: Optional[str] = None,
+    ) -> Tuple[List[Category], List[ClassifiedItem]]:
+        """Generate subcategories for the items and return them together with every item classified into one of them."""  # noqa: E501
+        pass
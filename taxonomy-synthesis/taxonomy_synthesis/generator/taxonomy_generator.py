@@ -1,34 +1,140 @@
 import json
-from typing import List, Optional
+import threading
+import time
+from typing import TYPE_CHECKING, Callable, Dict, List, Optional, TypeVar
 from taxonomy_synthesis.models import Item, Category
-from openai import OpenAI
-from openai.types.chat.chat_completion_message_param import (
-    ChatCompletionMessageParam,
-)  # noqa
-from openai.types.chat.chat_completion_tool_message_param import (
-    ChatCompletionToolMessageParam,
-)  # noqa
+from taxonomy_synthesis.routing.model_cascade import ModelCascade
+
+if TYPE_CHECKING:
+    from openai import OpenAI
+    from openai.types.chat.chat_completion_message_param import (
+        ChatCompletionMessageParam,
+    )  # noqa
+
+T = TypeVar("T")
+
+SUBCATEGORIES_TOOL = {
+    "type": "function",
+    "function": {
+        "name": "subcategories_list",
+        "strict": True,
+        "parameters": {
+            "$defs": {
+                "category": {
+                    "description": "Category for items.",
+                    "properties": {
+                        "name": {
+                            "description": "Name of the category.",
+                            "type": "string",
+                        },
+                        "description": {
+                            "description": "Description and instruction for how to use this category.",
+                            "type": "string",
+                        },
+                    },
+                    "required": ["name", "description"],
+                    "type": "object",
+                    "additionalProperties": False,
+                }
+            },
+            "description": "Matches the item with its category.",
+            "properties": {
+                "categories": {
+                    "description": "List of categories to match the item with.",
+                    "items": {"$ref": "#/$defs/category"},
+                    "type": "array",
+                }
+            },
+            "required": ["categories"],
+            "type": "object",
+            "additionalProperties": False,
+        },
+        "description": "Matches the item with its category.",
+    },
+}
+
+
+class RefinementSession:
+    """
+    Compact state of an interactive refinement for a single parent category.
+
+    The items are sampled once when the session is created; later turns only
+    send this sample, the current categories and the feedback.
+    """  # noqa: E501
+
+    def __init__(
+        self,
+        parent_category: Category,
+        items: List[Item],
+        categories: List[Category],
+        max_categories: Optional[int] = None,
+        sample_token_limit: int = 8000,
+    ):
+        self.parent_category = parent_category
+        self.categories = categories
+        self.max_categories = max_categories
+        self.feedback_history: List[str] = []
+        self.item_count = len(items)
+        self.item_sample = self._sample_items(items, sample_token_limit)
+        self.lock = threading.Lock()
+
+    @staticmethod
+    def _sample_items(items: List[Item], sample_token_limit: int) -> List[dict]:
+        """
+        Pick evenly spaced items until the sample reaches the token limit.
+        """
+        dumped = [item.model_dump() for item in items]
+        if len(str(dumped)) / 3 <= sample_token_limit:
+            return dumped
+
+        sample: List[dict] = []
+        sample_token_count = 0.0
+        step = max(1, len(dumped) // 100)
+        for offset in range(step):
+            for item in dumped[offset::step]:
+                item_token_count = len(str(item)) / 3
+                if sample_token_count + item_token_count > sample_token_limit:
+                    return sample
+                sample.append(item)
+                sample_token_count += item_token_count
+        return sample
 
 
 class TaxonomyGenerator:
     def __init__(
         self,
-        client: OpenAI,
+        client: "OpenAI",
         generation_method: str = "",
         max_categories: Optional[int] = None,
+        cascade: Optional[ModelCascade] = None,
     ):
         self.client = client
+        self.cascade = cascade or ModelCascade()
         self.max_categories = max_categories
         self.generation_method = generation_method
-        self.chat_history: List[ChatCompletionMessageParam] = []
+        self.chat_history: List["ChatCompletionMessageParam"] = []
+        self.sessions: Dict[str, RefinementSession] = {}
+        self.last_session_key: Optional[str] = None
+        self._sessions_lock = threading.Lock()
+
+    @staticmethod
+    def _max_categories_prompt(max_categories: Optional[int]) -> str:
+        if max_categories:
+            return f"You can create at most {max_categories} subcategories."
+        return ""
 
     def initialize_chat(self, items: List[Item], parent_category: Category):
-        if self.max_categories:
-            max_categories_prompt = (
-                f"You can create at most {self.max_categories} subcategories."
-            )
-        else:
-            max_categories_prompt = ""
+        self.chat_history = self._initial_messages(
+            items, parent_category, self.max_categories
+        )
+
+    def _initial_messages(
+        self,
+        items: List[Item],
+        parent_category: Category,
+        max_categories: Optional[int],
+    ) -> List["ChatCompletionMessageParam"]:
+        max_categories_prompt = self._max_categories_prompt(max_categories)
         prompt = f"""I will provide you with items inside the parent category titled `{parent_category.name}` described as `{parent_category.description}`.
 You need to create subcategories according to the following guideline:
 {max_categories_prompt}
@@ -37,74 +143,61 @@ ITEMS:
 ```
 {[item.model_dump() for item in items]}
 ```"""  # noqa
-        self.chat_history = [{"role": "user", "content": prompt}]
+        return [{"role": "user", "content": prompt}]
 
-    def generate_categories(
+    def _request_categories(
         self,
-        items: List[Item],
-        parent_category: Category,
-        max_categories: Optional[int] = None,
+        messages: List["ChatCompletionMessageParam"],
+        max_categories: Optional[int],
     ) -> List[Category]:
-        item_token_count = len(str([item.model_dump() for item in items])) / 3
-        if item_token_count > 60000:
-            print(
-                "taxonomy-synthesis WARNING: Items will be truncated to just under 60000 tokens."
-            )
-            items = items.copy()
-            while item_token_count > 60000:
-                items.pop()
-                item_token_count = len(str([item.model_dump() for item in items])) / 3
-
-        self.initialize_chat(items, parent_category)
+        return self._request_tool(
+            messages,
+            SUBCATEGORIES_TOOL,
+            lambda arguments: self._parse_categories(arguments, max_categories),
+        )
 
+    @staticmethod
+    def _parse_categories(
+        arguments: dict, max_categories: Optional[int]
+    ) -> List[Category]:
+        categories_data = [Category(**cat) for cat in arguments["categories"]]
         if max_categories:
-            self.max_categories = max_categories
+            return categories_data[:max_categories]
+        else:
+            return categories_data
 
+    def _request_tool(
+        self,
+        messages: List["ChatCompletionMessageParam"],
+        tool: dict,
+        parse: Callable[[dict], T],
+        tier_index: int = 0,
+    ) -> T:
+        """
+        Call the tool on the given tier and parse its arguments, escalating to the next tier when the response is malformed.
+        """  # noqa: E501
+        try:
+            return self._request_tool_on_tier(messages, tool, parse, tier_index)
+        except (ValueError, KeyError, TypeError):
+            if not self.cascade.has_next(tier_index):
+                raise
+            self.cascade.record_escalation(tier_index, 1)
+            return self._request_tool(messages, tool, parse, tier_index + 1)
+
+    def _request_tool_on_tier(
+        self,
+        messages: List["ChatCompletionMessageParam"],
+        tool: dict,
+        parse: Callable[[dict], T],
+        tier_index: int,
+    ) -> T:
+        start = time.perf_counter()
         response = self.client.beta.chat.completions.parse(
-            model="gpt-4o-mini",
-            messages=self.chat_history,
-            tools=[
-                {
-                    "type": "function",
-                    "function": {
-                        "name": "subcategories_list",
-                        "strict": True,
-                        "parameters": {
-                            "$defs": {
-                                "category": {
-                                    "description": "Category for items.",
-                                    "properties": {
-                                        "name": {
-                                            "description": "Name of the category.",
-                                            "type": "string",
-                                        },
-                                        "description": {
-                                            "description": "Description and instruction for how to use this category.",
-                                            "type": "string",
-                                        },
-                                    },
-                                    "required": ["name", "description"],
-                                    "type": "object",
-                                    "additionalProperties": False,
-                                }
-                            },
-                            "description": "Matches the item with its category.",
-                            "properties": {
-                                "categories": {
-                                    "description": "List of categories to match the item with.",
-                                    "items": {"$ref": "#/$defs/category"},
-                                    "type": "array",
-                                }
-                            },
-                            "required": ["categories"],
-                            "type": "object",
-                            "additionalProperties": False,
-                        },
-                        "description": "Matches the item with its category.",
-                    },
-                },
-            ],
+            model=self.cascade.tiers[tier_index].model,
+            messages=messages,
+            tools=[tool],  # type: ignore
         )
+        self.cascade.record(tier_index, response, time.perf_counter() - start)
 
         # Check if response has the expected structure
         if (
@@ -122,42 +215,109 @@ ITEMS:
                 "Tool call arguments are missing in the model response."
             )  # noqa
 
-        # Add assistant's response to chat history
-        self.chat_history.append(
-            ChatCompletionToolMessageParam(**response.choices[0].message.model_dump())
-        )
+        return parse(json.loads(tool_call.function.arguments))
 
-        # Parse and return categories
-        categories_data = json.loads(
-            response.choices[0].message.tool_calls[0].function.arguments
-        )
-        categories_data = [Category(**cat) for cat in categories_data["categories"]]
-        if self.max_categories:
-            return categories_data[: self.max_categories]
-        else:
-            return categories_data
+    def generate_categories(
+        self,
+        items: List[Item],
+        parent_category: Category,
+        max_categories: Optional[int] = None,
+        session_key: Optional[str] = None,
+    ) -> List[Category]:
+        """
+        Generate subcategories for the items and open a refinement session for them under `session_key` (defaults to the parent category name).
+        """  # noqa: E501
+        all_items = items
+        item_token_count = len(str([item.model_dump() for item in items])) / 3
+        if item_token_count > 60000:
+            print(
+                "taxonomy-synthesis WARNING: Items will be truncated to just under 60000 tokens."
+            )
+            items = items.copy()
+            while item_token_count > 60000:
+                items.pop()
+                item_token_count = len(str([item.model_dump() for item in items])) / 3
 
-    def refine_categories(self, feedback: str) -> List[Category]:
-        self.chat_history.append({"role": "user", "content": feedback})
+        # kept per call so that concurrent generations for other nodes do not interfere
+        max_categories = max_categories or self.max_categories
+        messages = self._initial_messages(items, parent_category, max_categories)
+        categories = self._request_categories(messages, max_categories)
 
-        # Generate categories again based on feedback
-        response = self.client.chat.completions.create(
-            model="gpt-4o-mini", messages=self.chat_history
+        self._open_session(
+            session_key or parent_category.name,
+            parent_category,
+            all_items,
+            categories,
+            max_categories,
         )
+        return categories
 
-        if not response.choices or not response.choices[0].message.tool_calls:
-            raise ValueError(
-                "No tool calls found in the response from the model."
-            )  # noqa
+    def _open_session(
+        self,
+        session_key: str,
+        parent_category: Category,
+        items: List[Item],
+        categories: List[Category],
+        max_categories: Optional[int] = None,
+    ) -> None:
+        with self._sessions_lock:
+            self.sessions[session_key] = RefinementSession(
+                parent_category, items, categories, max_categories
+            )
+            self.last_session_key = session_key
 
-        # Assuming response handling similar to `generate_categories`
-        tool_call = response.choices[0].message.tool_calls[0]
+    def get_session(self, session_key: Optional[str] = None) -> RefinementSession:
+        """
+        Return the refinement session for `session_key`, or the most recently generated one.
+        """  # noqa: E501
+        with self._sessions_lock:
+            session_key = session_key or self.last_session_key
+            if session_key is None or session_key not in self.sessions:
+                raise ValueError(f"No refinement session found for '{session_key}'")
+            return self.sessions[session_key]
 
-        # Check if tool_call is not None before attempting to access it
-        if tool_call is None or tool_call.function.arguments is None:
-            raise ValueError(
-                "Tool call arguments are missing in the model response."
-            )  # noqa
+    def end_session(self, session_key: str) -> None:
+        """
+        Discard the refinement session for `session_key`.
+        """
+        with self._sessions_lock:
+            self.sessions.pop(session_key, None)
+            if self.last_session_key == session_key:
+                self.last_session_key = None
 
-        categories_data = json.loads(tool_call.function.arguments)
-        return [Category(**cat) for cat in categories_data["categories"]]
+    def refine_categories(
+        self, feedback: str, session_key: Optional[str] = None
+    ) -> List[Category]:
+        """
+        Refine the categories of a session based on feedback, sending only the item sample, the current categories and the feedback.
+        """  # noqa: E501
+        session = self.get_session(session_key)
+        with session.lock:
+            parent_category = session.parent_category
+            previous_feedback_prompt = ""
+            if session.feedback_history:
+                previous_feedback_prompt = f"""PREVIOUS FEEDBACK:
+```
+{session.feedback_history}
+```
+"""
+            prompt = f"""I previously created subcategories for items inside the parent category titled `{parent_category.name}` described as `{parent_category.description}`.
+You need to revise the subcategories according to the following guideline:
+{self._max_categories_prompt(session.max_categories)}
+The created subcategories should not duplicate the parent category '{parent_category.name}'. {self.generation_method}
+ITEMS (sample of {len(session.item_sample)} out of {session.item_count}):
+```
+{session.item_sample}
+```
+CURRENT SUBCATEGORIES:
+```
+{[category.model_dump() for category in session.categories]}
+```
+{previous_feedback_prompt}FEEDBACK:
+{feedback}"""  # noqa
+            categories = self._request_categories(
+                [{"role": "user", "content": prompt}], session.max_categories
+            )
+            session.categories = categories
+            session.feedback_history.append(feedback)
+        return categories
@@ -2,5 +2,13 @@ from .item import Item
 from .category import Category
 from .classified_item import ClassifiedItem
 from .response_item import ResponseItem
+from .model_tier import ModelTier, TierStats
 
-__all__ = ["Item", "Category", "ClassifiedItem", "ResponseItem"]
+__all__ = [
+    "Item",
+    "Category",
+    "ClassifiedItem",
+    "ResponseItem",
+    "ModelTier",
+    "TierStats",
+]
@@ -0,0 +1,19 @@
+from pydantic import BaseModel
+
+
+class ModelTier(BaseModel):
+    model: str
+    input_cost_per_million: float = 0.0
+    output_cost_per_million: float = 0.0
+    samples: int = 1
+
+
+class TierStats(BaseModel):
+    model: str
+    calls: int = 0
+    items: int = 0
+    escalated_items: int = 0
+    prompt_tokens: int = 0
+    completion_tokens: int = 0
+    cost: float = 0.0
+    latency: float = 0.0
@@ -0,0 +1,62 @@
+import threading
+from typing import Any, List, Optional
+from taxonomy_synthesis.models import ModelTier, TierStats
+
+DEFAULT_MODEL = "gpt-4o-mini"
+
+
+class ModelCascade:
+    """
+    Ordered model tiers, from the cheapest/fastest to the strongest.
+
+    Work runs on the first tier; items that come back missing, inconsistent or
+    with an agreement below `min_agreement` are escalated to the next tier.
+    Calls, tokens, cost and latency are tracked per tier.
+    """  # noqa: E501
+
+    def __init__(
+        self, tiers: Optional[List[ModelTier]] = None, min_agreement: float = 1.0
+    ):
+        self.tiers = tiers or [ModelTier(model=DEFAULT_MODEL)]
+        self.min_agreement = min_agreement
+        self.stats = [TierStats(model=tier.model) for tier in self.tiers]
+        self._lock = threading.Lock()
+
+    def has_next(self, tier_index: int) -> bool:
+        return tier_index + 1 < len(self.tiers)
+
+    def record(
+        self, tier_index: int, response: Any, latency: float, items: int = 0
+    ) -> None:
+        """
+        Record the usage, cost and latency of a call made on the given tier.
+        """
+        tier = self.tiers[tier_index]
+        usage = getattr(response, "usage", None)
+        prompt_tokens = getattr(usage, "prompt_tokens", 0) or 0
+        completion_tokens = getattr(usage, "completion_tokens", 0) or 0
+        with self._lock:
+            stats = self.stats[tier_index]
+            stats.calls += 1
+            stats.items += items
+            stats.prompt_tokens += prompt_tokens
+            stats.completion_tokens += completion_tokens
+            stats.cost += (
+                prompt_tokens * tier.input_cost_per_million
+                + completion_tokens * tier.output_cost_per_million
+            ) / 1_000_000
+            stats.latency += latency
+
+    def record_escalation(self, tier_index: int, items: int) -> None:
+        """
+        Record that items were escalated away from the given tier.
+        """
+        with self._lock:
+            self.stats[tier_index].escalated_items += items
+
+    def summary(self) -> List[TierStats]:
+        """
+        Return a copy of the stats of every tier.
+        """
+        with self._lock:
+            return [stats.model_copy() for stats in self.stats]
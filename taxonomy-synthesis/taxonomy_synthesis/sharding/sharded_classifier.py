@@ -0,0 +1,216 @@
+import hashlib
+import multiprocessing
+import os
+import tempfile
+import time
+import traceback
+import uuid
+from typing import Callable, Dict, List, Optional
+from taxonomy_synthesis.models import Item, Category, ClassifiedItem
+from taxonomy_synthesis.classifiers.classifier_interface import IClassifier
+from taxonomy_synthesis.sharding.work_queue import SQLiteWorkQueue
+
+# default wait for a job on a shared queue, whose shards may be held by workers on other hosts
+SHARED_QUEUE_TIMEOUT = 3600.0
+
+
+def shard_of(item_id: str, num_shards: int) -> int:
+    """
+    Stable shard of an item id, identical across processes and hosts.
+    """
+    digest = hashlib.sha1(item_id.encode()).digest()
+    return int.from_bytes(digest[:8], "big") % num_shards
+
+
+def run_worker(
+    queue_path: str,
+    classifier_factory: Callable[[], IClassifier],
+    job_id: Optional[str] = None,
+    idle_timeout: float = 0.0,
+    poll_interval: float = 1.0,
+) -> int:
+    """
+    Classify shards claimed from the queue until none is left for `idle_timeout` seconds, and return how many were processed.
+    The classifier is built inside the worker, so `classifier_factory` must be picklable (e.g. a module level function).
+    """  # noqa: E501
+    queue = SQLiteWorkQueue(queue_path)
+    classifier = classifier_factory()
+    processed = 0
+    idle_since = time.monotonic()
+    while True:
+        claimed = queue.claim(job_id)
+        if claimed is None:
+            if time.monotonic() - idle_since >= idle_timeout:
+                return processed
+            time.sleep(poll_interval)
+            continue
+        claimed_job_id, shard, payload, lease = claimed
+        try:
+            items = [Item(**item) for item in payload["items"]]
+            # read-only snapshot of the node's categories
+            categories = [Category(**category) for category in payload["categories"]]
+            classified_items = classifier.classify_items(items, categories)
+            queue.complete(
+                claimed_job_id,
+                shard,
+                lease,
+                [
+                    {
+                        "item_id": classified_item.item.id,
+                        "category_name": classified_item.category.name,
+                    }
+                    for classified_item in classified_items
+                ],
+            )
+        except Exception:
+            queue.fail(claimed_job_id, shard, lease, traceback.format_exc())
+        processed += 1
+        idle_since = time.monotonic()
+
+
+class ShardedClassifier(IClassifier):
+    """
+    Splits items into shards by id hash and classifies the shards in worker processes through a SQLite work queue.
+
+    With a `queue_path` workers on other hosts, started with `run_worker` on the same file, can claim shards
+    too, and with `processes=0` only they do. As their shards can stay claimed after they die, `timeout`
+    then defaults to SHARED_QUEUE_TIMEOUT seconds; with a private queue it defaults to no limit.
+    Results are merged in the order of the input items.
+    """  # noqa: E501
+
+    def __init__(
+        self,
+        classifier_factory: Callable[[], IClassifier],
+        num_shards: int = 16,
+        processes: Optional[int] = None,
+        queue_path: Optional[str] = None,
+        poll_interval: float = 0.5,
+        timeout: Optional[float] = None,
+    ):
+        self.classifier_factory = classifier_factory
+        self.num_shards = num_shards
+        self.processes = (os.cpu_count() or 1) if processes is None else processes
+        if self.processes == 0 and queue_path is None:
+            raise ValueError(
+                "processes=0 requires a queue_path shared with the remote workers"
+            )
+        self.queue_path = queue_path
+        self.poll_interval = poll_interval
+        if timeout is None and queue_path is not None:
+            timeout = SHARED_QUEUE_TIMEOUT
+        self.timeout = timeout
+
+    def classify_items(
+        self,
+        items: List[Item],
+        categories: List[Category],
+        on_item: Optional[Callable[[ClassifiedItem], None]] = None,
+    ) -> List[ClassifiedItem]:
+        if not items:
+            return []
+
+        shards: List[List[dict]] = [[] for _ in range(self.num_shards)]
+        for item in items:
+            shards[shard_of(item.id, self.num_shards)].append(item.model_dump())
+        snapshot = [category.model_dump() for category in categories]
+        payloads = [
+            {"items": shard, "categories": snapshot} for shard in shards if shard
+        ]
+
+        queue_path = self.queue_path
+        temporary_dir = None
+        if queue_path is None:
+            temporary_dir = tempfile.TemporaryDirectory()
+            queue_path = os.path.join(temporary_dir.name, "queue.sqlite")
+        queue = SQLiteWorkQueue(queue_path)
+        job_id = uuid.uuid4().hex
+        try:
+            queue.put_shards(job_id, payloads)
+            workers = [
+                multiprocessing.Process(
+                    target=run_worker,
+                    args=(queue_path, self.classifier_factory, job_id),
+                )
+                for _ in range(min(self.processes, len(payloads)))
+            ]
+            for worker in workers:
+                worker.start()
+            try:
+                results = self._wait(queue, job_id, len(payloads), workers)
+            except BaseException:
+                # stop paying for shards of a job that already failed
+                queue.cancel(job_id)
+                for worker in workers:
+                    worker.terminate()
+                raise
+            finally:
+                for worker in workers:
+                    worker.join()
+        finally:
+            queue.delete(job_id)
+            if temporary_dir is not None:
+                temporary_dir.cleanup()
+
+        return self._merge(items, categories, results, on_item)
+
+    def _wait(
+        self,
+        queue: SQLiteWorkQueue,
+        job_id: str,
+        num_payloads: int,
+        workers: List[multiprocessing.Process],
+    ) -> Dict[int, list]:
+        start = time.monotonic()
+        while True:
+            results = queue.results(job_id)
+            failures = [
+                result for status, result in results.values() if status == "failed"
+            ]
+            if failures:
+                raise ValueError(f"Shard classification failed:\n{failures[0]}")
+            if len(results) == num_payloads:
+                return {shard: result for shard, (_, result) in results.items()}
+            if workers and not any(worker.is_alive() for worker in workers):
+                # local workers exit when nothing is left to claim, while shards of a
+                # shared queue may still be held or picked up by workers on other hosts
+                status = queue.status(job_id)
+                unfinished = status.get("pending", 0) + status.get("claimed", 0)
+                if len(queue.results(job_id)) < num_payloads and (
+                    self.queue_path is None or not unfinished
+                ):
+                    raise ValueError("Shard workers exited before finishing the job.")
+            if self.timeout is not None and time.monotonic() - start > self.timeout:
+                raise TimeoutError(
+                    f"Shard classification did not finish within {self.timeout} seconds."
+                )
+            time.sleep(self.poll_interval)
+
+    def _merge(
+        self,
+        items: List[Item],
+        categories: List[Category],
+        results: Dict[int, list],
+        on_item: Optional[Callable[[ClassifiedItem], None]],
+    ) -> List[ClassifiedItem]:
+        """
+        Map the shard outputs back to the input items, in the order of the input items.
+        """
+        category_names: Dict[str, str] = {}
+        for shard in sorted(results):
+            for response_item in results[shard]:
+                category_names.setdefault(
+                    response_item["item_id"], response_item["category_name"]
+                )
+        categories_by_name = {category.name: category for category in categories}
+
+        classified_items = []
+        for item in items:
+            if item.id not in category_names:
+                continue
+            classified_item = ClassifiedItem(
+                item=item, category=categories_by_name[category_names[item.id]]
+            )
+            classified_items.append(classified_item)
+            if on_item:
+                on_item(classified_item)
+        return classified_items
@@ -0,0 +1,141 @@
+import json
+import sqlite3
+import time
+from contextlib import contextmanager
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+
+class SQLiteWorkQueue:
+    """
+    Work queue of classification shards backed by a SQLite file.
+
+    Several processes, or several hosts sharing the file on a filesystem with working
+    locks, can claim shards from the same queue. A claimed shard whose worker did not
+    complete it within `lease_seconds` can be claimed again.
+    """  # noqa: E501
+
+    def __init__(self, path: str, lease_seconds: float = 600.0):
+        self.path = path
+        self.lease_seconds = lease_seconds
+        with self._connect() as connection:
+            connection.execute(
+                """CREATE TABLE IF NOT EXISTS shards (
+                    job_id TEXT NOT NULL,
+                    shard INTEGER NOT NULL,
+                    payload TEXT NOT NULL,
+                    status TEXT NOT NULL DEFAULT 'pending',
+                    claimed_at REAL,
+                    result TEXT,
+                    PRIMARY KEY (job_id, shard)
+                )"""
+            )
+
+    @contextmanager
+    def _connect(self) -> Iterator[sqlite3.Connection]:
+        connection = sqlite3.connect(self.path, timeout=60, isolation_level=None)
+        try:
+            yield connection
+        finally:
+            connection.close()
+
+    def put_shards(self, job_id: str, payloads: List[Dict[str, Any]]) -> None:
+        """
+        Enqueue the payloads of a job as shards numbered in order.
+        """
+        with self._connect() as connection:
+            connection.execute("BEGIN IMMEDIATE")
+            connection.executemany(
+                "INSERT INTO shards (job_id, shard, payload) VALUES (?, ?, ?)",
+                [
+                    (job_id, shard, json.dumps(payload))
+                    for shard, payload in enumerate(payloads)
+                ],
+            )
+            connection.execute("COMMIT")
+
+    def claim(
+        self, job_id: Optional[str] = None
+    ) -> Optional[Tuple[str, int, Dict[str, Any], float]]:
+        """
+        Atomically claim a pending (or expired) shard, optionally restricted to one job.
+        Returns the job id, shard, payload and the lease, which must be passed back to `complete` or `fail`.
+        """  # noqa: E501
+        with self._connect() as connection:
+            connection.execute("BEGIN IMMEDIATE")
+            row = connection.execute(
+                """SELECT job_id, shard, payload FROM shards
+                WHERE (status = 'pending' OR (status = 'claimed' AND claimed_at < ?))
+                AND (? IS NULL OR job_id = ?)
+                ORDER BY job_id, shard LIMIT 1""",
+                (time.time() - self.lease_seconds, job_id, job_id),
+            ).fetchone()
+            if row is None:
+                connection.execute("COMMIT")
+                return None
+            lease = time.time()
+            connection.execute(
+                "UPDATE shards SET status = 'claimed', claimed_at = ? "
+                "WHERE job_id = ? AND shard = ?",
+                (lease, row[0], row[1]),
+            )
+            connection.execute("COMMIT")
+            return row[0], row[1], json.loads(row[2]), lease
+
+    def complete(self, job_id: str, shard: int, lease: float, result: Any) -> bool:
+        return self._finish(job_id, shard, lease, "done", result)
+
+    def fail(self, job_id: str, shard: int, lease: float, error: str) -> bool:
+        return self._finish(job_id, shard, lease, "failed", error)
+
+    def _finish(
+        self, job_id: str, shard: int, lease: float, status: str, result: Any
+    ) -> bool:
+        """
+        Store the result of a shard, only if it is still claimed under the given lease.
+        Returns False when the shard was cancelled or claimed again after the lease expired.
+        """  # noqa: E501
+        with self._connect() as connection:
+            cursor = connection.execute(
+                "UPDATE shards SET status = ?, result = ? "
+                "WHERE job_id = ? AND shard = ? AND status = 'claimed' AND claimed_at = ?",
+                (status, json.dumps(result), job_id, shard, lease),
+            )
+            return cursor.rowcount == 1
+
+    def cancel(self, job_id: str) -> None:
+        """
+        Mark the shards of a job that are not finished as cancelled, so no worker claims them.
+        """
+        with self._connect() as connection:
+            connection.execute(
+                "UPDATE shards SET status = 'cancelled' "
+                "WHERE job_id = ? AND status IN ('pending', 'claimed')",
+                (job_id,),
+            )
+
+    def status(self, job_id: str) -> Dict[str, int]:
+        """
+        Count the shards of a job per status.
+        """
+        with self._connect() as connection:
+            rows = connection.execute(
+                "SELECT status, COUNT(*) FROM shards WHERE job_id = ? GROUP BY status",
+                (job_id,),
+            ).fetchall()
+        return {status: count for status, count in rows}
+
+    def results(self, job_id: str) -> Dict[int, Tuple[str, Any]]:
+        """
+        Return the status and result of every finished shard of a job, by shard.
+        """
+        with self._connect() as connection:
+            rows = connection.execute(
+                "SELECT shard, status, result FROM shards "
+                "WHERE job_id = ? AND status IN ('done', 'failed') ORDER BY shard",
+                (job_id,),
+            ).fetchall()
+        return {shard: (status, json.loads(result)) for shard, status, result in rows}
+
+    def delete(self, job_id: str) -> None:
+        with self._connect() as connection:
+            connection.execute("DELETE FROM shards WHERE job_id = ?", (job_id,))
@@ -1,18 +1,33 @@
-from typing import List, Optional
+import inspect
+from typing import Callable, List, Optional
 from taxonomy_synthesis.models import Item, Category, ClassifiedItem
 from taxonomy_synthesis.tree.tree_node import TreeNode
 from taxonomy_synthesis.classifiers.classifier_interface import IClassifier
+from taxonomy_synthesis.generator.generator_interface import IClassifiedGenerator
 from taxonomy_synthesis.generator.taxonomy_generator import TaxonomyGenerator
+from taxonomy_synthesis.dedup.item_deduplicator import ItemDeduplicator
 
 
 class NodeOperator:
-    def __init__(self, classifier: IClassifier, generator: TaxonomyGenerator):
+    def __init__(
+        self,
+        classifier: IClassifier,
+        generator: TaxonomyGenerator,
+        deduplicator: Optional[ItemDeduplicator] = None,
+    ):
         self.classifier = classifier
         self.generator = generator
+        self.deduplicator = deduplicator
 
-    def classify_items(self, node: TreeNode, items: List[Item]) -> List[ClassifiedItem]:
+    def classify_items(
+        self,
+        node: TreeNode,
+        items: List[Item],
+        on_item: Optional[Callable[[ClassifiedItem], None]] = None,
+    ) -> List[ClassifiedItem]:
         """
         Classify the given items, remove any duplicates from the tree, and assign them to appropriate categories within the specified TreeNode.
+        Items are added to the tree as soon as the classifier emits them, after which `on_item` is called.
         """  # noqa: E501
         categories = [child.value for child in node.children]
         all_items = node.get_all_items()  # Get all items recursively
@@ -23,33 +38,99 @@ class NodeOperator:
             if existing_item.id in item_ids_to_classify:
                 self._remove_item_from_tree(node, existing_item)
 
-        # Classify the new items
-        classified_items = self.classifier.classify_items(items, categories)
+        category_nodes = {child.value.name: child for child in node.children}
+        inserted_items = set()
 
-        # Add classified items to appropriate nodes
-        for classified_item in classified_items:
-            item = classified_item.item
+        def insert(classified_item: ClassifiedItem) -> None:
             category_name = classified_item.category.name
 
             # Find the appropriate category node
-            category_node = next(
-                (
-                    child
-                    for child in node.children
-                    if child.value.name == category_name
-                ),  # noqa: E501
-                None,
-            )
+            category_node = category_nodes.get(category_name)
 
             if category_node is None:
                 # Raise error if category node is not found
                 raise ValueError(f"Category '{category_name}' not found in the tree")
 
             # Add the item to the category node
-            category_node.add_items([item])
+            category_node.add_items([classified_item.item])
+            inserted_items.add(id(classified_item.item))
+            if on_item:
+                on_item(classified_item)
+
+        # Classify the new items
+        classified_items = self._classify_unique_items(items, categories, insert)
+
+        # Add classified items the classifier did not emit
+        for classified_item in classified_items:
+            if id(classified_item.item) not in inserted_items:
+                insert(classified_item)
 
         return classified_items
 
+    def _classify_unique_items(
+        self,
+        items: List[Item],
+        categories: List[Category],
+        on_item: Callable[[ClassifiedItem], None],
+    ) -> List[ClassifiedItem]:
+        """
+        Classify one representative per group of duplicate items and fan its category out to the other members.
+        """  # noqa: E501
+        if self.deduplicator is None:
+            return self._call_classifier(items, categories, on_item)
+
+        groups = self.deduplicator.group(items)
+        # map back by identity first, falling back to the (unique) id for classifiers returning copies
+        members_by_object = {id(group[0]): group for group in groups}
+        members_by_id = {group[0].id: group for group in groups}
+        representatives = [group[0] for group in groups]
+
+        def fan_out(classified_representative: ClassifiedItem) -> List[ClassifiedItem]:
+            representative = classified_representative.item
+            members = (
+                members_by_object.get(id(representative))
+                or members_by_id[representative.id]
+            )
+            return [
+                ClassifiedItem(item=member, category=classified_representative.category)
+                for member in members
+            ]
+
+        def on_representative(classified_representative: ClassifiedItem) -> None:
+            for classified_item in fan_out(classified_representative):
+                on_item(classified_item)
+
+        classified_representatives = self._call_classifier(
+            representatives, categories, on_representative
+        )
+        return [
+            classified_item
+            for classified_representative in classified_representatives
+            for classified_item in fan_out(classified_representative)
+        ]
+
+    def _call_classifier(
+        self,
+        items: List[Item],
+        categories: List[Category],
+        on_item: Callable[[ClassifiedItem], None],
+    ) -> List[ClassifiedItem]:
+        """
+        Call the classifier, passing `on_item` only if it accepts it; items from classifiers with the
+        older `classify_items(items, categories)` signature are placed after it returns.
+        """  # noqa: E501
+        try:
+            parameters = inspect.signature(self.classifier.classify_items).parameters
+        except (TypeError, ValueError):
+            parameters = {}  # type: ignore
+        accepts_on_item = "on_item" in parameters or any(
+            parameter.kind == inspect.Parameter.VAR_KEYWORD
+            for parameter in parameters.values()
+        )
+        if accepts_on_item:
+            return self.classifier.classify_items(items, categories, on_item=on_item)
+        return self.classifier.classify_items(items, categories)
+
     def _remove_item_from_tree(self, node: TreeNode, item: Item) -> None:
         """
         Helper method to remove an item from the tree starting from the given node.
@@ -72,8 +153,48 @@ class NodeOperator:
         items = node.items
 
         new_categories = self.generator.generate_categories(
-            items, parent_category, max_categories
+            items, parent_category, max_categories, session_key=node.path()
+        )
+        self.add_subcategories(node, new_categories)
+        return new_categories
+
+    def generate_classified_subcategories(
+        self, node: TreeNode, max_categories: Optional[int] = None
+    ) -> List[ClassifiedItem]:
+        """
+        Generate subcategories for the given TreeNode by clustering its items, and move the items into the generated subcategories.
+        Requires an IClassifiedGenerator, such as ClusterTaxonomyGenerator.
+        """  # noqa: E501
+        if not isinstance(self.generator, IClassifiedGenerator):
+            raise TypeError(
+                f"{type(self.generator).__name__} does not assign items to the generated categories"
+            )
+        new_categories, classified_items = (
+            self.generator.generate_classified_categories(
+                node.items, node.value, max_categories, session_key=node.path()
+            )
+        )
+        self.add_subcategories(node, new_categories)
+        category_nodes = {child.value.name: child for child in node.children}
+        for classified_item in classified_items:
+            category_nodes[classified_item.category.name].add_items(
+                [classified_item.item]
+            )
+        moved_items = {id(classified_item.item) for classified_item in classified_items}
+        node.items = [item for item in node.items if id(item) not in moved_items]
+        return classified_items
+
+    def refine_subcategories(self, node: TreeNode, feedback: str) -> List[Category]:
+        """
+        Refine the subcategories generated for the given TreeNode based on feedback, replacing its children.
+        Items already placed in the replaced children are moved back to the node.
+        """  # noqa: E501
+        new_categories = self.generator.refine_categories(
+            feedback, session_key=node.path()
         )
+        for child in list(node.children):
+            node.add_items(child.get_all_items())
+            node.remove_child(child)
         self.add_subcategories(node, new_categories)
         return new_categories
 
@@ -1,4 +1,4 @@
-from typing import List, Optional
+from typing import Any, Dict, List, Optional
 from taxonomy_synthesis.models import Item, Category
 
 
@@ -46,6 +46,47 @@ class TreeNode:
             all_items.extend(child.get_all_items())
         return all_items
 
+    def find(self, path: str) -> Optional["TreeNode"]:
+        """
+        Find the node with the given path (as returned by `path`) in the subtree of the current node.
+        """  # noqa: E501
+        if self.path() == path:
+            return self
+        for child in self.children:
+            node = child.find(path)
+            if node is not None:
+                return node
+        return None
+
+    def to_dict(self) -> Dict[str, Any]:
+        """
+        Recursively serialize the tree starting from the current node.
+        """
+        return {
+            **self.value.model_dump(),
+            "items": [item.model_dump() for item in self.items],
+            "children": [child.to_dict() for child in self.children],
+        }
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> "TreeNode":
+        """
+        Recursively build a tree from the output of `to_dict`.
+        """
+        node = cls(value=Category(name=data["name"], description=data["description"]))
+        node.add_items([Item(**item) for item in data.get("items", [])])
+        for child in data.get("children", []):
+            node.add_child(cls.from_dict(child))
+        return node
+
+    def path(self) -> str:
+        """
+        Return the names of the categories from the root down to the current node, separated by '/'.
+        """  # noqa: E501
+        if self.parent is None:
+            return self.value.name
+        return f"{self.parent.path()}/{self.value.name}"
+
     def print_tree(self, level: int = 0) -> str:
         """
         Recursively print the tree structure starting from the current node.
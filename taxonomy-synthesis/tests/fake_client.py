@@ -0,0 +1,46 @@
+import json
+from types import SimpleNamespace
+from typing import List, Union
+
+
+class FakeClient:
+    """Stand-in for the OpenAI client that replays queued tool call arguments."""
+
+    def __init__(self, responses: List[Union[dict, List[dict]]]):
+        self.responses = list(responses)
+        self.calls: List[dict] = []
+        self.beta = SimpleNamespace(
+            chat=SimpleNamespace(completions=SimpleNamespace(parse=self._create))
+        )
+        self.chat = SimpleNamespace(completions=SimpleNamespace(create=self._create))
+
+    def _create(self, **kwargs):
+        self.calls.append(kwargs)
+        response = self.responses.pop(0)
+        if kwargs.get("stream"):
+            return self._stream(json.dumps(response))
+        choices_arguments = response if isinstance(response, list) else [response]
+        choices = []
+        for arguments in choices_arguments:
+            tool_call = SimpleNamespace(
+                function=SimpleNamespace(arguments=json.dumps(arguments))
+            )
+            message = SimpleNamespace(
+                tool_calls=[tool_call],
+                model_dump=lambda: {"role": "assistant", "content": None},
+            )
+            choices.append(SimpleNamespace(message=message))
+        usage = SimpleNamespace(prompt_tokens=1000, completion_tokens=100)
+        return SimpleNamespace(choices=choices, usage=usage)
+
+    def _stream(self, arguments: str, chunk_size: int = 7):
+        for start in range(0, len(arguments), chunk_size):
+            tool_call = SimpleNamespace(
+                function=SimpleNamespace(
+                    arguments=arguments[start : start + chunk_size]
+                )
+            )
+            delta = SimpleNamespace(tool_calls=[tool_call])
+            yield SimpleNamespace(choices=[SimpleNamespace(delta=delta)], usage=None)
+        usage = SimpleNamespace(prompt_tokens=1000, completion_tokens=100)
+        yield SimpleNamespace(choices=[], usage=usage)
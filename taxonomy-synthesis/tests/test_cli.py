@@ -0,0 +1,217 @@
+import json
+import subprocess
+import sys
+from taxonomy_synthesis import cli
+from taxonomy_synthesis.models import Item, Category
+from taxonomy_synthesis.sharding.work_queue import SQLiteWorkQueue
+from taxonomy_synthesis.tree.tree_node import TreeNode
+from tests.fake_client import FakeClient
+
+
+def write_tree(tmp_path) -> str:
+    root_node = TreeNode(value=Category(name="Animals", description="All animals"))
+    mammal_node = TreeNode(value=Category(name="Mammals", description="Mammals"))
+    root_node.add_child(mammal_node)
+    mammal_node.add_items([Item(id="🐕", name="Dog")])  # type: ignore
+    tree_path = str(tmp_path / "tree.json")
+    with open(tree_path, "w") as file:
+        json.dump(root_node.to_dict(), file)
+    return tree_path
+
+
+def write_items(tmp_path, items) -> str:
+    items_path = str(tmp_path / "items.jsonl")
+    with open(items_path, "w") as file:
+        for item in items:
+            file.write(json.dumps(item) + "\n")
+    return items_path
+
+
+def read_tree(tree_path) -> TreeNode:
+    with open(tree_path) as file:
+        return TreeNode.from_dict(json.load(file))
+
+
+def test_build(tmp_path, capsys, monkeypatch):
+    client = FakeClient(
+        [
+            {
+                "categories": [
+                    {"name": "Mammals", "description": "Mammals"},
+                    {"name": "Birds", "description": "Birds"},
+                ]
+            },
+            {
+                "classified_items": [
+                    {"item_id": "1", "category_name": "Mammals"},
+                    {"item_id": "2", "category_name": "Birds"},
+                ]
+            },
+        ]
+    )
+    monkeypatch.setattr(cli, "_client", lambda: client)
+    items_path = write_items(
+        tmp_path, [{"id": "1", "name": "Dog"}, {"id": "2", "name": "Eagle"}]
+    )
+
+    cli.main(["build", "--name", "Animals", "--input", items_path])
+
+    tree = TreeNode.from_dict(json.loads(capsys.readouterr().out))
+    assert tree.print_tree() == "Animals: []\n  Mammals: [1]\n  Birds: [2]\n"
+
+
+def test_classify_stream(tmp_path, capsys, monkeypatch):
+    client = FakeClient(
+        [
+            {
+                "classified_items": [
+                    {"item_id": "🐈", "category_name": "Mammals"},
+                    {"item_id": "🦅", "category_name": "Birds"},
+                ]
+            }
+        ]
+    )
+    monkeypatch.setattr(cli, "_client", lambda: client)
+    tree_path = write_tree(tmp_path)
+    tree = read_tree(tree_path)
+    tree.add_child(TreeNode(value=Category(name="Birds", description="Birds")))
+    with open(tree_path, "w") as file:
+        json.dump(tree.to_dict(), file)
+    items_path = write_items(
+        tmp_path, [{"id": "🐈", "name": "Cat"}, {"id": "🦅", "name": "Eagle"}]
+    )
+
+    cli.main(["classify", "--tree", tree_path, "--input", items_path, "--stream"])
+
+    lines = capsys.readouterr().out.splitlines()
+    assert [json.loads(line) for line in lines] == [
+        {"item_id": "🐈", "category": "Mammals"},
+        {"item_id": "🦅", "category": "Birds"},
+    ]
+    assert client.calls[0]["stream"] is True
+    assert read_tree(tree_path).print_tree() == (
+        "Animals: []\n  Mammals: [🐕, 🐈]\n  Birds: [🦅]\n"
+    )
+
+
+def test_update(tmp_path, capsys, monkeypatch):
+    client = FakeClient(
+        [
+            {
+                "classified_items": [
+                    {"item_id": "1", "category_name": "Mammals"},
+                    {"item_id": "2", "category_name": "Birds"},
+                ]
+            },
+            {"classified_items": [{"item_id": "1", "category_name": "Dogs"}]},
+        ]
+    )
+    monkeypatch.setattr(cli, "_client", lambda: client)
+    tree_path = write_tree(tmp_path)
+    tree = read_tree(tree_path)
+    tree.children[0].add_child(TreeNode(value=Category(name="Dogs", description="")))
+    tree.add_child(TreeNode(value=Category(name="Birds", description="Birds")))
+    with open(tree_path, "w") as file:
+        json.dump(tree.to_dict(), file)
+    output_path = str(tmp_path / "output.json")
+    items_path = write_items(
+        tmp_path, [{"id": "1", "name": "Poodle"}, {"id": "2", "name": "Eagle"}]
+    )
+
+    cli.main(
+        ["update", "--tree", tree_path, "--input", items_path, "--output", output_path]
+    )
+
+    lines = capsys.readouterr().out.splitlines()
+    assert sorted(json.loads(line)["path"] for line in lines) == [
+        "Animals/Birds",
+        "Animals/Mammals/Dogs",
+    ]
+    assert read_tree(output_path).find("Animals/Mammals/Dogs").items == [
+        Item(id="1", name="Poodle")
+    ]
+    assert read_tree(tree_path).find("Animals/Mammals/Dogs").items == []
+
+
+def test_update_leaf_node(tmp_path, capsys, monkeypatch):
+    client = FakeClient([])
+    monkeypatch.setattr(cli, "_client", lambda: client)
+    tree_path = write_tree(tmp_path)
+    items_path = write_items(
+        tmp_path, [{"id": "🐕", "name": "Dog v2"}, {"id": "🐈", "name": "Cat"}]
+    )
+
+    cli.main(
+        [
+            "update",
+            "--tree",
+            tree_path,
+            "--node",
+            "Animals/Mammals",
+            "--input",
+            items_path,
+        ]
+    )
+
+    lines = capsys.readouterr().out.splitlines()
+    assert [json.loads(line) for line in lines] == [
+        {"item_id": "🐕", "path": "Animals/Mammals"},
+        {"item_id": "🐈", "path": "Animals/Mammals"},
+    ]
+    assert client.calls == []
+    assert read_tree(tree_path).find("Animals/Mammals").items == [
+        Item(id="🐕", name="Dog v2"),
+        Item(id="🐈", name="Cat"),
+    ]
+
+
+def test_worker(tmp_path, capsys, monkeypatch):
+    client = FakeClient(
+        [
+            {"classified_items": [{"item_id": "1", "category_name": "Mammals"}]},
+            {"classified_items": [{"item_id": "2", "category_name": "Birds"}]},
+        ]
+    )
+    monkeypatch.setattr(cli, "_client", lambda: client)
+    queue_path = str(tmp_path / "queue.sqlite")
+    queue = SQLiteWorkQueue(queue_path)
+    snapshot = [
+        {"name": "Mammals", "description": "Mammals"},
+        {"name": "Birds", "description": "Birds"},
+    ]
+    queue.put_shards(
+        "job",
+        [
+            {"items": [{"id": "1"}], "categories": snapshot},
+            {"items": [{"id": "2"}], "categories": snapshot},
+        ],
+    )
+
+    cli.main(["worker", "--queue", queue_path])
+
+    assert json.loads(capsys.readouterr().out) == {"processed_shards": 2}
+    assert queue.status("job") == {"done": 2}
+
+
+def test_export_jsonl(tmp_path, capsys):
+    cli.main(["export", "--tree", write_tree(tmp_path)])
+
+    lines = capsys.readouterr().out.splitlines()
+    assert [json.loads(line) for line in lines] == [
+        {"path": "Animals/Mammals", "item": {"id": "🐕", "name": "Dog"}}
+    ]
+
+
+def test_export_does_not_import_openai(tmp_path):
+    code = (
+        "import sys\n"
+        "from taxonomy_synthesis import cli\n"
+        f"cli.main(['--timings', 'export', '--format', 'text', '--tree', {write_tree(tmp_path)!r}])\n"
+        "assert 'openai' not in sys.modules and 'numpy' not in sys.modules\n"
+    )
+    result = subprocess.run(
+        [sys.executable, "-c", code], capture_output=True, text=True, check=True
+    )
+
+    assert result.stdout == "Animals: []\n  Mammals: [🐕]\n"
+    assert json.loads(result.stderr)["import_seconds"] == {}
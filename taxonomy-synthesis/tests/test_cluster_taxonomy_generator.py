@@ -0,0 +1,70 @@
+import numpy as np
+import pytest
+from taxonomy_synthesis.generator.cluster_taxonomy_generator import (
+    ClusterTaxonomyGenerator,
+    hashing_embedder,
+    kmeans,
+)
+from taxonomy_synthesis.models import Item, Category
+from taxonomy_synthesis.tree.tree_node import TreeNode
+from taxonomy_synthesis.generator.taxonomy_generator import TaxonomyGenerator
+from taxonomy_synthesis.tree.node_operator import NodeOperator
+from tests.fake_client import FakeClient
+
+fruits = [
+    Item(id=f"f{i}", name=f"{color} apple fruit", kind="fruit")  # type: ignore
+    for i, color in enumerate(["red", "green", "yellow", "pink"])
+]
+tools = [
+    Item(id=f"t{i}", name=f"{size} steel hammer tool", kind="tool")  # type: ignore
+    for i, size in enumerate(["small", "large", "heavy", "light"])
+]
+
+
+def test_kmeans_separates_clusters():
+    labels = kmeans(hashing_embedder(fruits + tools), 2)
+
+    assert len(set(labels[:4])) == 1
+    assert len(set(labels[4:])) == 1
+    assert labels[0] != labels[4]
+    assert list(np.unique(labels)) == [0, 1]
+
+
+def test_generate_classified_subcategories():
+    client = FakeClient(
+        [
+            {
+                "categories": [
+                    {"cluster_id": "0", "name": "Fruits", "description": "Fruits"},
+                    {"cluster_id": "1", "name": "Tools", "description": "Tools"},
+                ]
+            }
+        ]
+    )
+    generator = ClusterTaxonomyGenerator(
+        client=client, max_categories=2, exemplars_per_cluster=2  # type: ignore
+    )
+    operator = NodeOperator(classifier=None, generator=generator)  # type: ignore
+    node = TreeNode(value=Category(name="Things", description="Things"))
+    node.add_items(fruits + tools)
+
+    classified_items = operator.generate_classified_subcategories(node)
+
+    assert len(client.calls) == 1
+    prompt = client.calls[0]["messages"][0]["content"]
+    assert prompt.count("'id': ") == 4
+    assert len(classified_items) == 8
+    assert node.items == []
+    assert [child.value.name for child in node.children] == ["Fruits", "Tools"]
+    assert node.children[0].items == fruits
+    assert node.children[1].items == tools
+
+
+def test_generate_classified_subcategories_requires_classified_generator():
+    generator = TaxonomyGenerator(client=FakeClient([]))  # type: ignore
+    operator = NodeOperator(classifier=None, generator=generator)  # type: ignore
+    node = TreeNode(value=Category(name="Things", description="Things"))
+    node.add_items(fruits)
+
+    with pytest.raises(TypeError):
+        operator.generate_classified_subcategories(node)
@@ -0,0 +1,210 @@
+import pytest
+from taxonomy_synthesis.classifiers.classifier_interface import IClassifier
+from taxonomy_synthesis.classifiers.gpt_classifier import GPTClassifier
+from taxonomy_synthesis.classifiers.stream_parser import ArrayObjectStreamParser
+from taxonomy_synthesis.dedup.item_deduplicator import ItemDeduplicator
+from taxonomy_synthesis.models import Item, Category, ClassifiedItem, ModelTier
+from taxonomy_synthesis.routing.model_cascade import ModelCascade
+from taxonomy_synthesis.tree.tree_node import TreeNode
+from taxonomy_synthesis.tree.node_operator import NodeOperator
+from tests.fake_client import FakeClient
+
+
+def classified_response(*pairs):
+    return {
+        "classified_items": [
+            {"item_id": item_id, "category_name": category_name}
+            for item_id, category_name in pairs
+        ]
+    }
+
+
+categories = [
+    Category(name="A", description="Category A"),
+    Category(name="B", description="Category B"),
+]
+
+
+def test_classify_items_escalates_hard_items():
+    client = FakeClient(
+        [
+            # "2" is inconsistent and "3" is missing on the cheap tier
+            classified_response(("1", "A"), ("2", "A"), ("2", "B")),
+            classified_response(("2", "B"), ("3", "A")),
+        ]
+    )
+    cascade = ModelCascade(
+        tiers=[
+            ModelTier(model="cheap", input_cost_per_million=1.0),
+            ModelTier(model="strong", input_cost_per_million=10.0),
+        ]
+    )
+    classifier = GPTClassifier(client=client, cascade=cascade)  # type: ignore
+    items = [Item(id="1"), Item(id="2"), Item(id="3")]
+
+    classified_items = classifier.classify_items(items, categories)
+
+    assert {
+        (classified_item.item.id, classified_item.category.name)
+        for classified_item in classified_items
+    } == {("1", "A"), ("2", "B"), ("3", "A")}
+    assert [call["model"] for call in client.calls] == ["cheap", "strong"]
+    assert "'id': '1'" not in client.calls[1]["messages"][0]["content"]
+    stats = cascade.summary()
+    assert stats[0].items == 3 and stats[0].escalated_items == 2
+    assert stats[1].items == 2 and stats[1].escalated_items == 0
+    assert stats[0].cost == 0.001 and stats[1].cost == 0.01
+
+
+def test_classify_items_low_agreement_samples():
+    client = FakeClient(
+        [
+            [
+                classified_response(("1", "A"), ("2", "A")),
+                classified_response(("1", "A"), ("2", "B")),
+            ],
+            classified_response(("2", "B")),
+        ]
+    )
+    cascade = ModelCascade(
+        tiers=[ModelTier(model="cheap", samples=2), ModelTier(model="strong")],
+        min_agreement=0.75,
+    )
+    classifier = GPTClassifier(client=client, cascade=cascade)  # type: ignore
+
+    classified_items = classifier.classify_items(
+        [Item(id="1"), Item(id="2")], categories
+    )
+
+    assert [
+        (classified_item.item.id, classified_item.category.name)
+        for classified_item in classified_items
+    ] == [("1", "A"), ("2", "B")]
+    assert client.calls[0]["n"] == 2
+
+
+def test_array_object_stream_parser():
+    parser = ArrayObjectStreamParser()
+    text = '{"classified_items": [{"item_id": "1", "category_name": "A}{\\"["}, {"item_id": "2", "category_name": "B"}]}'
+
+    objects = []
+    for start in range(0, len(text), 5):
+        objects += parser.feed(text[start : start + 5])
+
+    assert objects == [
+        {"item_id": "1", "category_name": 'A}{"['},
+        {"item_id": "2", "category_name": "B"},
+    ]
+
+
+def test_classify_items_stream_inserts_early():
+    client = FakeClient(
+        [
+            classified_response(("1", "A"), ("1", "B"), ("2", "B")),
+            classified_response(("3", "A")),
+        ]
+    )
+    classifier = GPTClassifier(client=client, stream=True)  # type: ignore
+    root_node = TreeNode(value=Category(name="Root", description="Root"))
+    for category in categories:
+        root_node.add_child(TreeNode(value=category))
+    operator = NodeOperator(classifier=classifier, generator=None)  # type: ignore
+    emitted = []
+
+    def on_item(classified_item):
+        # the item is already in the tree when it is emitted
+        assert classified_item.item in root_node.get_all_items()
+        emitted.append((classified_item.item.id, classified_item.category.name))
+
+    classified_items = operator.classify_items(
+        root_node, [Item(id="1"), Item(id="2"), Item(id="3")], on_item
+    )
+
+    assert emitted == [("1", "A"), ("2", "B"), ("3", "A")]
+    assert len(classified_items) == 3
+    assert [item.id for item in root_node.children[0].items] == ["1", "3"]
+    assert client.calls[0]["stream"] is True
+    assert classifier.cascade.summary()[0].prompt_tokens == 2000
+
+
+def test_classify_items_escalates_malformed_response():
+    client = FakeClient(
+        [
+            {"unexpected": []},
+            classified_response(("1", "A"), ("2", "B")),
+        ]
+    )
+    cascade = ModelCascade(tiers=[ModelTier(model="cheap"), ModelTier(model="strong")])
+    classifier = GPTClassifier(client=client, cascade=cascade)  # type: ignore
+
+    classified_items = classifier.classify_items(
+        [Item(id="1"), Item(id="2")], categories
+    )
+
+    assert [
+        (classified_item.item.id, classified_item.category.name)
+        for classified_item in classified_items
+    ] == [("1", "A"), ("2", "B")]
+    assert [call["model"] for call in client.calls] == ["cheap", "strong"]
+    assert cascade.summary()[0].escalated_items == 2
+
+
+class LegacyClassifier(IClassifier):
+    """Classifier implementing the two-argument signature."""
+
+    def classify_items(self, items, categories):  # type: ignore
+        return [ClassifiedItem(item=item, category=categories[0]) for item in items]
+
+
+def test_classify_items_with_legacy_classifier():
+    root_node = TreeNode(value=Category(name="Root", description="Root"))
+    for category in categories:
+        root_node.add_child(TreeNode(value=category))
+    operator = NodeOperator(
+        classifier=LegacyClassifier(),
+        generator=None,  # type: ignore
+        deduplicator=ItemDeduplicator(),
+    )
+    emitted = []
+
+    classified_items = operator.classify_items(
+        root_node, [Item(id="1", name="x"), Item(id="2", name="x")], emitted.append
+    )
+
+    assert len(classified_items) == 2
+    assert [item.id for item in root_node.children[0].items] == ["1", "2"]
+    assert [classified_item.item.id for classified_item in emitted] == ["1", "2"]
+
+
+def test_stream_rejects_samples():
+    cascade = ModelCascade(tiers=[ModelTier(model="cheap", samples=3)])
+
+    with pytest.raises(ValueError):
+        GPTClassifier(client=FakeClient([]), cascade=cascade, stream=True)  # type: ignore
+
+
+def test_stream_escalates_malformed_items():
+    client = FakeClient(
+        [
+            {
+                "classified_items": [
+                    {"item_id": "1", "category_name": "A"},
+                    {"item_id": "2"},
+                ]
+            },
+            classified_response(("2", "B")),
+        ]
+    )
+    cascade = ModelCascade(tiers=[ModelTier(model="cheap"), ModelTier(model="strong")])
+    classifier = GPTClassifier(client=client, cascade=cascade, stream=True)  # type: ignore
+
+    classified_items = classifier.classify_items(
+        [Item(id="1"), Item(id="2")], categories
+    )
+
+    assert [
+        (classified_item.item.id, classified_item.category.name)
+        for classified_item in classified_items
+    ] == [("1", "A"), ("2", "B")]
+    assert cascade.summary()[0].escalated_items == 1
+    assert cascade.summary()[0].prompt_tokens == 1000
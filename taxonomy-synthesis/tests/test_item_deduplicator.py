@@ -0,0 +1,84 @@
+import pytest
+from taxonomy_synthesis.dedup.item_deduplicator import ItemDeduplicator
+from taxonomy_synthesis.classifiers.gpt_classifier import GPTClassifier
+from taxonomy_synthesis.models import Item, Category
+from taxonomy_synthesis.tree.tree_node import TreeNode
+from taxonomy_synthesis.tree.node_operator import NodeOperator
+from tests.fake_client import FakeClient
+
+
+def test_group_exact_duplicates():
+    items = [
+        Item(id="1", name="Red  Apple", price=1),
+        Item(id="2", name="red apple ", price=1),
+        Item(id="3", name="Red Apple", price=2),
+    ]
+
+    groups = ItemDeduplicator().group(items)
+
+    assert [[item.id for item in group] for group in groups] == [["1", "2"], ["3"]]
+
+
+def test_group_near_duplicates():
+    description = "A crisp and sweet red apple grown in the orchards of Washington"
+    items = [
+        Item(id="1", name="Red Apple", description=description),
+        Item(id="2", name="Red Apple", description=description + "!"),
+        Item(id="3", name="Banana", description="A long yellow tropical fruit"),
+    ]
+
+    assert len(ItemDeduplicator().group(items)) == 3
+    groups = ItemDeduplicator(near_duplicates=True, threshold=0.7).group(items)
+    assert [[item.id for item in group] for group in groups] == [["1", "2"], ["3"]]
+
+
+def test_classify_items_fans_out_duplicates():
+    client = FakeClient(
+        [
+            {
+                "classified_items": [
+                    {"item_id": "1", "category_name": "Fruit"},
+                    {"item_id": "3", "category_name": "Vegetable"},
+                ]
+            }
+        ]
+    )
+    operator = NodeOperator(
+        classifier=GPTClassifier(client=client),  # type: ignore
+        generator=None,  # type: ignore
+        deduplicator=ItemDeduplicator(),
+    )
+    root_node = TreeNode(value=Category(name="Food", description="Food"))
+    fruit_node = TreeNode(value=Category(name="Fruit", description="Fruit"))
+    vegetable_node = TreeNode(value=Category(name="Vegetable", description="Veg"))
+    root_node.add_child(fruit_node)
+    root_node.add_child(vegetable_node)
+    items = [
+        Item(id="1", name="Apple"),
+        Item(id="2", name="Apple"),
+        Item(id="3", name="Carrot"),
+    ]
+
+    classified_items = operator.classify_items(root_node, items)
+
+    assert len(classified_items) == 3
+    assert [item.id for item in fruit_node.items] == ["1", "2"]
+    assert [item.id for item in vegetable_node.items] == ["3"]
+    assert "'id': '2'" not in client.calls[0]["messages"][0]["content"]
+
+
+def test_group_rejects_repeated_ids():
+    items = [Item(id="1", name="a"), Item(id="1", name="b")]
+
+    with pytest.raises(ValueError):
+        ItemDeduplicator().group(items)
+
+
+def test_signature_numpy_matches_pure_python():
+    deduplicator = ItemDeduplicator(near_duplicates=True)
+    shingles = deduplicator._shingles("a crisp and sweet red apple")
+
+    numpy_signature = deduplicator._signature(shingles)
+    deduplicator._np = None
+
+    assert deduplicator._signature(shingles) == numpy_signature
@@ -0,0 +1,211 @@
+import multiprocessing
+import os
+import threading
+import time
+from typing import List
+import pytest
+from taxonomy_synthesis.classifiers.classifier_interface import IClassifier
+from taxonomy_synthesis.models import Item, Category, ClassifiedItem
+from taxonomy_synthesis.sharding.sharded_classifier import (
+    SHARED_QUEUE_TIMEOUT,
+    ShardedClassifier,
+    run_worker,
+    shard_of,
+)
+from taxonomy_synthesis.sharding.work_queue import SQLiteWorkQueue
+from taxonomy_synthesis.tree.tree_node import TreeNode
+from taxonomy_synthesis.tree.node_operator import NodeOperator
+
+
+class ParityClassifier(IClassifier):
+    """Classifies items by the parity of their numeric id."""
+
+    def classify_items(self, items, categories, on_item=None) -> List[ClassifiedItem]:
+        return [
+            ClassifiedItem(item=item, category=categories[int(item.id) % 2])
+            for item in items
+        ]
+
+
+def parity_classifier_factory() -> IClassifier:
+    return ParityClassifier()
+
+
+class FailingClassifier(IClassifier):
+    def classify_items(self, items, categories, on_item=None) -> List[ClassifiedItem]:
+        raise RuntimeError("classifier failed")
+
+
+def failing_classifier_factory() -> IClassifier:
+    return FailingClassifier()
+
+
+categories = [
+    Category(name="Even", description="Even ids"),
+    Category(name="Odd", description="Odd ids"),
+]
+
+
+def test_shard_of_is_stable():
+    assert shard_of("item-1", 16) == shard_of("item-1", 16)
+    assert {shard_of(str(i), 4) for i in range(100)} == {0, 1, 2, 3}
+
+
+def test_classify_items_merges_in_input_order():
+    root_node = TreeNode(value=Category(name="Numbers", description="Numbers"))
+    for category in categories:
+        root_node.add_child(TreeNode(value=category))
+    operator = NodeOperator(
+        classifier=ShardedClassifier(
+            parity_classifier_factory, num_shards=8, processes=3, poll_interval=0.05
+        ),
+        generator=None,  # type: ignore
+    )
+    items = [Item(id=str(i)) for i in range(50)]
+
+    classified_items = operator.classify_items(root_node, items)
+
+    assert [classified_item.item.id for classified_item in classified_items] == [
+        item.id for item in items
+    ]
+    assert [item.id for item in root_node.children[0].items] == [
+        str(i) for i in range(0, 50, 2)
+    ]
+    assert [item.id for item in root_node.children[1].items] == [
+        str(i) for i in range(1, 50, 2)
+    ]
+
+
+def test_run_worker_drains_shared_queue(tmp_path):
+    queue_path = os.path.join(tmp_path, "queue.sqlite")
+    queue = SQLiteWorkQueue(queue_path)
+    snapshot = [category.model_dump() for category in categories]
+    queue.put_shards(
+        "job",
+        [
+            {"items": [{"id": "1"}], "categories": snapshot},
+            {"items": [{"id": "2"}], "categories": snapshot},
+        ],
+    )
+
+    assert run_worker(queue_path, parity_classifier_factory) == 2
+    assert queue.status("job") == {"done": 2}
+    assert queue.results("job")[1] == (
+        "done",
+        [{"item_id": "2", "category_name": "Even"}],
+    )
+
+
+def test_failed_shard_raises():
+    classifier = ShardedClassifier(
+        failing_classifier_factory, num_shards=8, processes=2, poll_interval=0.05
+    )
+
+    with pytest.raises(ValueError, match="classifier failed"):
+        classifier.classify_items([Item(id=str(i)) for i in range(50)], categories)
+
+
+def test_cancel_stops_claims(tmp_path):
+    queue = SQLiteWorkQueue(os.path.join(tmp_path, "queue.sqlite"))
+    queue.put_shards("job", [{"items": []}, {"items": []}])
+    queue.claim("job")
+
+    queue.cancel("job")
+
+    assert queue.claim("job") is None
+    assert queue.status("job") == {"cancelled": 2}
+
+
+def test_remote_workers_require_queue_path():
+    with pytest.raises(ValueError, match="queue_path"):
+        ShardedClassifier(parity_classifier_factory, processes=0)
+
+
+def test_remote_workers_timeout(tmp_path):
+    classifier = ShardedClassifier(
+        parity_classifier_factory,
+        processes=0,
+        queue_path=os.path.join(tmp_path, "queue.sqlite"),
+        poll_interval=0.05,
+        timeout=0.2,
+    )
+
+    with pytest.raises(TimeoutError):
+        classifier.classify_items([Item(id="1")], categories)
+
+
+def test_finish_requires_current_lease(tmp_path):
+    queue = SQLiteWorkQueue(os.path.join(tmp_path, "queue.sqlite"), lease_seconds=0)
+    queue.put_shards("job", [{"items": []}])
+    _, _, _, expired_lease = queue.claim("job")  # type: ignore
+    time.sleep(0.01)
+    _, _, _, lease = queue.claim("job")  # type: ignore
+
+    assert not queue.complete("job", 0, expired_lease, [])
+    assert queue.status("job") == {"claimed": 1}
+    assert queue.complete("job", 0, lease, [])
+    assert not queue.fail("job", 0, lease, "late failure")
+    assert queue.status("job") == {"done": 1}
+
+
+def test_finish_after_cancel_is_ignored(tmp_path):
+    queue = SQLiteWorkQueue(os.path.join(tmp_path, "queue.sqlite"))
+    queue.put_shards("job", [{"items": []}])
+    _, _, _, lease = queue.claim("job")  # type: ignore
+    queue.cancel("job")
+
+    assert not queue.complete("job", 0, lease, [])
+    assert queue.status("job") == {"cancelled": 1}
+
+
+def test_wait_for_shards_claimed_by_remote_workers(tmp_path):
+    queue_path = os.path.join(tmp_path, "queue.sqlite")
+    queue = SQLiteWorkQueue(queue_path)
+    payload = {"items": [], "categories": []}
+    queue.put_shards("job", [payload, payload])
+    _, _, _, lease = queue.claim("job")  # type: ignore
+    # local workers have already exited while a remote worker still holds a shard
+    local_worker = multiprocessing.Process(
+        target=run_worker, args=(queue_path, parity_classifier_factory, "job")
+    )
+    local_worker.start()
+    local_worker.join()
+    remote_worker = threading.Timer(0.2, queue.complete, ("job", 0, lease, []))
+    remote_worker.start()
+    classifier = ShardedClassifier(
+        parity_classifier_factory, queue_path=queue_path, poll_interval=0.05
+    )
+
+    assert classifier._wait(queue, "job", 2, [local_worker]) == {0: [], 1: []}
+    remote_worker.join()
+
+
+def test_run_worker_waits_for_shards(tmp_path):
+    queue_path = os.path.join(tmp_path, "queue.sqlite")
+    queue = SQLiteWorkQueue(queue_path)
+    snapshot = [category.model_dump() for category in categories]
+    coordinator = threading.Timer(
+        0.2,
+        queue.put_shards,
+        ("job", [{"items": [{"id": "1"}], "categories": snapshot}]),
+    )
+    coordinator.start()
+
+    assert (
+        run_worker(
+            queue_path, parity_classifier_factory, idle_timeout=0.5, poll_interval=0.05
+        )
+        == 1
+    )
+    coordinator.join()
+    assert queue.status("job") == {"done": 1}
+
+
+def test_shared_queue_has_default_timeout(tmp_path):
+    classifier = ShardedClassifier(
+        parity_classifier_factory,
+        processes=0,
+        queue_path=os.path.join(tmp_path, "queue.sqlite"),
+    )
+
+    assert classifier.timeout == SHARED_QUEUE_TIMEOUT
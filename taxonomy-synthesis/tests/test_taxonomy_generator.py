@@ -0,0 +1,92 @@
+from taxonomy_synthesis.models import Item, Category
+from taxonomy_synthesis.generator.taxonomy_generator import TaxonomyGenerator
+from taxonomy_synthesis.tree.tree_node import TreeNode
+from taxonomy_synthesis.tree.node_operator import NodeOperator
+from tests.fake_client import FakeClient
+
+
+def categories_response(*names):
+    return {
+        "categories": [{"name": name, "description": f"{name} items"} for name in names]
+    }
+
+
+def test_refine_categories_sends_compact_history():
+    client = FakeClient(
+        [
+            categories_response("A", "B"),
+            categories_response("A", "C"),
+            categories_response("D"),
+        ]
+    )
+    generator = TaxonomyGenerator(client=client)  # type: ignore
+    items = [Item(id=str(i), name=f"Item {i}", text="x" * 500) for i in range(200)]
+    parent_category = Category(name="Parent", description="Parent Description")
+
+    generator.generate_categories(items, parent_category)
+    generator.refine_categories("Rename B to C")
+    categories = generator.refine_categories("Merge everything")
+
+    assert [category.name for category in categories] == ["D"]
+    refine_messages = client.calls[2]["messages"]
+    assert len(refine_messages) == 1
+    assert "'name': 'C'" in refine_messages[0]["content"]
+    assert "Rename B to C" in refine_messages[0]["content"]
+    assert len(refine_messages[0]["content"]) < len(
+        client.calls[0]["messages"][0]["content"]
+    )
+    assert client.calls[2]["tools"][0]["function"]["name"] == "subcategories_list"
+
+
+def test_refine_subcategories_per_node():
+    client = FakeClient(
+        [
+            categories_response("A1", "A2"),
+            categories_response("B1", "B2"),
+            categories_response("A3"),
+        ]
+    )
+    operator = NodeOperator(
+        classifier=None, generator=TaxonomyGenerator(client=client)  # type: ignore
+    )
+    root_node = TreeNode(value=Category(name="Root", description="Root"))
+    node_a = TreeNode(value=Category(name="A", description="A"))
+    node_b = TreeNode(value=Category(name="B", description="B"))
+    root_node.add_child(node_a)
+    root_node.add_child(node_b)
+    node_a.add_items([Item(id="1")])
+    node_b.add_items([Item(id="2")])
+
+    operator.generate_subcategories(node_a)
+    operator.generate_subcategories(node_b)
+    node_a.children[0].add_items([Item(id="3")])
+    operator.refine_subcategories(node_a, "Only one category")
+
+    assert [child.value.name for child in node_a.children] == ["A3"]
+    assert [child.value.name for child in node_b.children] == ["B1", "B2"]
+    assert {item.id for item in node_a.items} == {"1", "3"}
+
+
+def test_refine_categories_uses_session_max_categories():
+    client = FakeClient(
+        [
+            categories_response("A1", "A2"),
+            categories_response("B1", "B2", "B3", "B4"),
+            categories_response("A1", "A2", "A3", "A4"),
+        ]
+    )
+    generator = TaxonomyGenerator(client=client)  # type: ignore
+    items = [Item(id="1")]
+
+    generator.generate_categories(
+        items, Category(name="A", description="A"), max_categories=2
+    )
+    generator.generate_categories(
+        items, Category(name="B", description="B"), max_categories=4
+    )
+    categories = generator.refine_categories("More categories", session_key="A")
+
+    assert [category.name for category in categories] == ["A1", "A2"]
+    assert "at most 2 subcategories" in client.calls[2]["messages"][0]["content"]
+    assert generator.max_categories is None
+    assert generator.chat_history == []
@@ -151,3 +151,25 @@ def test_print_tree():
 
     # Assert
     assert output == expected_output
+
+
+def test_path():
+    root_node = TreeNode(value=Category(name="ROOT", description="Root category"))
+    child_node = TreeNode(value=Category(name="CHILD", description="Child category"))
+    root_node.add_child(child_node)
+
+    assert root_node.path() == "ROOT"
+    assert child_node.path() == "ROOT/CHILD"
+
+
+def test_to_dict_from_dict():
+    root_node = TreeNode(value=Category(name="ROOT", description="Root category"))
+    child_node = TreeNode(value=Category(name="CHILD", description="Child category"))
+    root_node.add_child(child_node)
+    child_node.add_items([Item(id="1", name="Item 1")])
+
+    copied_node = TreeNode.from_dict(root_node.to_dict())
+
+    assert copied_node.print_tree() == root_node.print_tree()
+    assert copied_node.find("ROOT/CHILD").items == child_node.items  # type: ignore
+    assert copied_node.find("ROOT/OTHER") is None